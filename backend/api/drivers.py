@@ -1,89 +1,119 @@
 import secrets
 
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, Header, HTTPException, Response
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session, raiseload
 from typing import List, Optional
 
-from ..database import get_db, Driver
+from ..database import get_db, Driver, delete_driver_rows
 from ..models import DriverCreate, DriverUpdate, Driver as DriverModel
+from ..services.etag import conditional_json_response
 
 router = APIRouter(prefix="/api/drivers", tags=["drivers"])
 
+# Generated tokens carry 128 bits of entropy, so a retry is practically never needed
+TOKEN_GENERATION_ATTEMPTS = 3
 
-def _generate_unique_driver_token(db: Session) -> str:
-    token = secrets.token_urlsafe(16)
-    while db.query(Driver).filter(Driver.access_code == token).first():
-        token = secrets.token_urlsafe(16)
-    return token
+
+def _generate_driver_token() -> str:
+    # Uniqueness is enforced by the unique index on drivers.access_code
+    return secrets.token_urlsafe(16)
 
 
 @router.post("/", response_model=DriverModel)
 def create_driver(driver: DriverCreate, db: Session = Depends(get_db)):
     """Create a new driver"""
-    driver_payload = driver.dict()
-    if not driver_payload.get("access_code"):
-        driver_payload["access_code"] = _generate_unique_driver_token(db)
+    driver_payload = driver.model_dump()
+    generate_token = not driver_payload.get("access_code")
+
+    for _ in range(TOKEN_GENERATION_ATTEMPTS):
+        if generate_token:
+            driver_payload["access_code"] = _generate_driver_token()
+        db_driver = Driver(**driver_payload)
+        db.add(db_driver)
+        try:
+            db.commit()
+            break
+        except IntegrityError:
+            db.rollback()
+            if not generate_token:
+                raise HTTPException(status_code=409, detail="Access code already in use")
+    else:
+        raise HTTPException(status_code=500, detail="Could not generate a unique access code")
 
-    db_driver = Driver(**driver_payload)
-    db.add(db_driver)
-    db.commit()
-    db.refresh(db_driver)
     return db_driver
 
 
 @router.get("/", response_model=List[DriverModel])
 def get_drivers(
+    response: Response,
     status: Optional[str] = None,
+    after_id: Optional[int] = None,
     skip: int = 0,
     limit: int = 100,
     db: Session = Depends(get_db)
 ):
-    """Get all drivers with optional status filter"""
-    query = db.query(Driver)
+    """
+    Get all drivers with optional status filter.
+    Page with after_id (the X-Next-Cursor header of the previous page) instead of skip.
+    """
+    # DriverModel has no relationship fields; fail loudly instead of lazy loading per row
+    query = db.query(Driver).options(raiseload("*"))
 
     if status:
         query = query.filter(Driver.status == status)
+    if after_id is not None:
+        query = query.filter(Driver.id > after_id)
 
-    drivers = query.offset(skip).limit(limit).all()
+    drivers = query.order_by(Driver.id).offset(skip).limit(limit).all()
+    if len(drivers) == limit:
+        response.headers["X-Next-Cursor"] = str(drivers[-1].id)
     return drivers
 
 
 @router.get("/{driver_id}", response_model=DriverModel)
-def get_driver(driver_id: int, db: Session = Depends(get_db)):
-    """Get a specific driver by ID"""
-    driver = db.query(Driver).filter(Driver.id == driver_id).first()
+def get_driver(
+    driver_id: int,
+    if_none_match: Optional[str] = Header(None),
+    db: Session = Depends(get_db)
+):
+    """Get a specific driver by ID (answers 304 when If-None-Match is current)"""
+    driver = db.get(Driver, driver_id)
     if not driver:
         raise HTTPException(status_code=404, detail="Driver not found")
-    return driver
+    return conditional_json_response(DriverModel.model_validate(driver), if_none_match)
 
 
 @router.put("/{driver_id}", response_model=DriverModel)
 def update_driver(driver_id: int, driver_update: DriverUpdate, db: Session = Depends(get_db)):
     """Update a driver"""
-    db_driver = db.query(Driver).filter(Driver.id == driver_id).first()
+    db_driver = db.get(Driver, driver_id)
     if not db_driver:
         raise HTTPException(status_code=404, detail="Driver not found")
 
-    update_data = driver_update.dict(exclude_unset=True)
+    update_data = driver_update.model_dump(exclude_unset=True)
 
     if "access_code" in update_data and not update_data.get("access_code"):
-        update_data["access_code"] = _generate_unique_driver_token(db)
+        update_data["access_code"] = _generate_driver_token()
 
     for field, value in update_data.items():
         setattr(db_driver, field, value)
 
-    db.commit()
-    db.refresh(db_driver)
+    try:
+        db.commit()
+    except IntegrityError:
+        db.rollback()
+        raise HTTPException(status_code=409, detail="Access code already in use")
     return db_driver
 
 
 @router.delete("/{driver_id}")
 def delete_driver(driver_id: int, db: Session = Depends(get_db)):
-    """Delete a driver"""
-    db_driver = db.query(Driver).filter(Driver.id == driver_id).first()
-    if not db_driver:
+    """Delete a driver along with their routes; their orders are unassigned"""
+    deleted = delete_driver_rows(db, driver_id)
+    if not deleted:
+        db.rollback()
         raise HTTPException(status_code=404, detail="Driver not found")
 
-    db.delete(db_driver)
     db.commit()
     return {"message": "Driver deleted successfully"}
@@ -1,116 +1,152 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, Header, HTTPException, Response
+from fastapi.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
 from typing import List, Optional
 
-from ..database import get_db, Depot, ParkingLocation
+from ..database import get_db, invalidate_depot_cache, Depot, ParkingLocation
 from ..models import (
     DepotCreate, Depot as DepotModel,
     ParkingLocationCreate, ParkingLocation as ParkingLocationModel
 )
-from ..services.geocoding import geocode_address
+from ..services.etag import conditional_json_response
+from ..services.geocoding import geocode_address_async
 
 router = APIRouter(prefix="/api/locations", tags=["locations"])
 
 
+def _add_and_commit(db: Session, instance):
+    """Blocking insert used by the async create endpoints via the threadpool"""
+    db.add(instance)
+    db.commit()
+    return instance
+
+
 # Depot endpoints
 @router.post("/depots", response_model=DepotModel)
-def create_depot(depot: DepotCreate, db: Session = Depends(get_db)):
+async def create_depot(depot: DepotCreate, db: Session = Depends(get_db)):
     """Create a new depot"""
-    depot_data = depot.dict()
+    depot_data = depot.model_dump()
 
     # Geocode if coordinates not provided
     if not depot_data.get("latitude") or not depot_data.get("longitude"):
-        coords = geocode_address(depot.address)
+        coords = await geocode_address_async(depot.address)
         if coords:
             depot_data["latitude"] = coords["lat"]
             depot_data["longitude"] = coords["lon"]
 
-    db_depot = Depot(**depot_data)
-    db.add(db_depot)
-    db.commit()
-    db.refresh(db_depot)
+    db_depot = await run_in_threadpool(_add_and_commit, db, Depot(**depot_data))
+    invalidate_depot_cache()
     return db_depot
 
 
 @router.get("/depots", response_model=List[DepotModel])
-def get_depots(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
-    """Get all depots"""
-    depots = db.query(Depot).offset(skip).limit(limit).all()
+def get_depots(
+    response: Response,
+    after_id: Optional[int] = None,
+    skip: int = 0,
+    limit: int = 100,
+    db: Session = Depends(get_db)
+):
+    """Get all depots (page with after_id from the X-Next-Cursor header)"""
+    query = db.query(Depot)
+    if after_id is not None:
+        query = query.filter(Depot.id > after_id)
+
+    depots = query.order_by(Depot.id).offset(skip).limit(limit).all()
+    if len(depots) == limit:
+        response.headers["X-Next-Cursor"] = str(depots[-1].id)
     return depots
 
 
 @router.get("/depots/{depot_id}", response_model=DepotModel)
-def get_depot(depot_id: int, db: Session = Depends(get_db)):
-    """Get a specific depot by ID"""
-    depot = db.query(Depot).filter(Depot.id == depot_id).first()
+def get_depot(
+    depot_id: int,
+    if_none_match: Optional[str] = Header(None),
+    db: Session = Depends(get_db)
+):
+    """Get a specific depot by ID (answers 304 when If-None-Match is current)"""
+    depot = db.get(Depot, depot_id)
     if not depot:
         raise HTTPException(status_code=404, detail="Depot not found")
-    return depot
+    return conditional_json_response(DepotModel.model_validate(depot), if_none_match)
 
 
 @router.delete("/depots/{depot_id}")
 def delete_depot(depot_id: int, db: Session = Depends(get_db)):
     """Delete a depot"""
-    depot = db.query(Depot).filter(Depot.id == depot_id).first()
-    if not depot:
+    deleted = db.query(Depot).filter(Depot.id == depot_id).delete(synchronize_session=False)
+    if not deleted:
+        db.rollback()
         raise HTTPException(status_code=404, detail="Depot not found")
 
-    db.delete(depot)
     db.commit()
+    invalidate_depot_cache()
     return {"message": "Depot deleted successfully"}
 
 
 # Parking location endpoints
 @router.post("/parking", response_model=ParkingLocationModel)
-def create_parking_location(
+async def create_parking_location(
     parking: ParkingLocationCreate,
     db: Session = Depends(get_db)
 ):
     """Create a new parking location"""
-    parking_data = parking.dict()
+    parking_data = parking.model_dump()
 
     # Geocode if coordinates not provided
     if not parking_data.get("latitude") or not parking_data.get("longitude"):
-        coords = geocode_address(parking.address)
+        coords = await geocode_address_async(parking.address)
         if coords:
             parking_data["latitude"] = coords["lat"]
             parking_data["longitude"] = coords["lon"]
 
-    db_parking = ParkingLocation(**parking_data)
-    db.add(db_parking)
-    db.commit()
-    db.refresh(db_parking)
-    return db_parking
+    return await run_in_threadpool(_add_and_commit, db, ParkingLocation(**parking_data))
 
 
 @router.get("/parking", response_model=List[ParkingLocationModel])
 def get_parking_locations(
+    response: Response,
+    after_id: Optional[int] = None,
     skip: int = 0,
     limit: int = 100,
     db: Session = Depends(get_db)
 ):
-    """Get all parking locations"""
-    parking_locations = db.query(ParkingLocation).offset(skip).limit(limit).all()
+    """Get all parking locations (page with after_id from the X-Next-Cursor header)"""
+    query = db.query(ParkingLocation)
+    if after_id is not None:
+        query = query.filter(ParkingLocation.id > after_id)
+
+    parking_locations = query.order_by(ParkingLocation.id).offset(skip).limit(limit).all()
+    if len(parking_locations) == limit:
+        response.headers["X-Next-Cursor"] = str(parking_locations[-1].id)
     return parking_locations
 
 
 @router.get("/parking/{parking_id}", response_model=ParkingLocationModel)
-def get_parking_location(parking_id: int, db: Session = Depends(get_db)):
-    """Get a specific parking location by ID"""
-    parking = db.query(ParkingLocation).filter(ParkingLocation.id == parking_id).first()
+def get_parking_location(
+    parking_id: int,
+    if_none_match: Optional[str] = Header(None),
+    db: Session = Depends(get_db)
+):
+    """Get a specific parking location by ID (answers 304 when If-None-Match is current)"""
+    parking = db.get(ParkingLocation, parking_id)
     if not parking:
         raise HTTPException(status_code=404, detail="Parking location not found")
-    return parking
+    return conditional_json_response(ParkingLocationModel.model_validate(parking), if_none_match)
 
 
 @router.delete("/parking/{parking_id}")
 def delete_parking_location(parking_id: int, db: Session = Depends(get_db)):
     """Delete a parking location"""
-    parking = db.query(ParkingLocation).filter(ParkingLocation.id == parking_id).first()
-    if not parking:
+    deleted = (
+        db.query(ParkingLocation)
+        .filter(ParkingLocation.id == parking_id)
+        .delete(synchronize_session=False)
+    )
+    if not deleted:
+        db.rollback()
         raise HTTPException(status_code=404, detail="Parking location not found")
 
-    db.delete(parking)
     db.commit()
     return {"message": "Parking location deleted successfully"}
 
@@ -118,7 +154,7 @@ def delete_parking_location(parking_id: int, db: Session = Depends(get_db)):
 @router.delete("/parking")
 def delete_all_parking_locations(db: Session = Depends(get_db)):
     """Delete all parking locations (keep only depots)"""
-    deleted_count = db.query(ParkingLocation).delete()
+    deleted_count = db.query(ParkingLocation).delete(synchronize_session=False)
     db.commit()
     return {
         "message": f"Deleted {deleted_count} parking location(s)",
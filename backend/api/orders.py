@@ -1,61 +1,93 @@
+import asyncio
 import os
-import uuid
+import secrets
 import base64
+import binascii
+import hashlib
+import tempfile
+import traceback
 from pathlib import Path
 
-from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form, Header, Query
-from sqlalchemy.orm import Session
-from sqlalchemy import or_, case
-from typing import List, Optional, Dict
+try:
+    # SIMD-accelerated drop-in for base64.b64decode
+    from pybase64 import b64decode
+except ImportError:
+    from base64 import b64decode
+
+import aiofiles
+import aiofiles.os
+from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form, Header, Query, Response
+from fastapi.concurrency import run_in_threadpool
+from pydantic import TypeAdapter
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session, defer, joinedload, raiseload, selectinload
+from sqlalchemy import and_, case, or_, func, insert, update
+from typing import List, NamedTuple, Optional, Dict, Tuple
 from datetime import datetime
-import re
 
-from ..database import get_db, Order, Driver, Route, RouteOrder
+from ..database import get_db, get_default_depot, json_type, Order, Driver, Route, RouteOrder, delete_order_rows, generate_order_numbers, priority_rank_for
 from ..models import (
     OrderCreate,
     OrderUpdate,
     Order as OrderModel,
+    OrderListItem,
     ParseTextRequest,
     DriverOrderAssignment,
     DriverStatusUpdateRequest,
 )
-from ..services.order_parser import parse_order_from_text
+from ..services.order_parser import parse_document, parse_order_from_text
+from ..services.osrm_client import get_route_multi
+from ..services.route_calculator import calculate_complete_route
 from ..services.order_validator import validate_order, calculate_priority_from_time_window
-from ..services.geocoding import geocode_address
+from ..services.geocoding import geocode_address, geocode_addresses
+from ..services.speech_to_text import audio_file_suffix, transcribe_audio_file_async
+from ..services.etag import compute_etag, etag_matches
+from ..services.json_response import json_response
 
 router = APIRouter(prefix="/api/orders", tags=["orders"])
 
 # Toggle driver_id fallback only for local testing.
 ALLOW_DRIVER_TEST_MODE = os.getenv("ALLOW_DRIVER_TEST_MODE", "false").lower() in {"1", "true", "yes"}
 PROOF_UPLOAD_DIR = Path(os.getenv("PROOF_UPLOAD_DIR", "uploads/proof"))
-ALLOWED_IMAGE_TYPES = {
-    "image/jpeg",
-    "image/jpg",
-    "image/png",
-    "image/webp",
-    "image/heic",
-    "image/heif",
+# Accepted image content types and the suffix stored files get for each
+IMAGE_TYPE_SUFFIXES = {
+    "image/jpeg": ".jpg",
+    "image/jpg": ".jpg",
+    "image/png": ".png",
+    "image/webp": ".webp",
+    "image/heic": ".heic",
+    "image/heif": ".heif",
 }
 IMAGE_SUFFIX_WHITELIST = {".jpg", ".jpeg", ".png", ".webp", ".heic", ".heif"}
-
-DRIVER_STATUS_TO_ORDER_STATUS: Dict[str, str] = {
-    "assigned": "assigned",
-    "accepted": "assigned",
-    "en_route": "in_transit",
-    "arrived": "in_transit",
-    "delivered": "completed",
-    "failed": "failed",
-    "issue_reported": "in_transit",
+UPLOAD_CHUNK_SIZE = 1 << 20  # 1 MiB
+MAX_UPLOAD_BYTES = int(os.getenv("MAX_UPLOAD_BYTES", str(25 << 20)))
+
+# A taken order_number is replaced once; a second failure is a real error
+ORDER_INSERT_ATTEMPTS = 2
+
+class DriverStatusEffect(NamedTuple):
+    """What a driver status update changes besides the order's driver_status"""
+    order_status: Optional[str]
+    route_status: Optional[str]
+    driver_status: Optional[str]
+    marks_arrival: bool
+
+
+# One lookup per status update instead of separate maps and membership tests
+DRIVER_STATUS_EFFECTS: Dict[str, DriverStatusEffect] = {
+    "assigned": DriverStatusEffect("assigned", "pending", None, False),
+    "accepted": DriverStatusEffect("assigned", "pending", "on_route", False),
+    "en_route": DriverStatusEffect("in_transit", "in_transit", "on_route", False),
+    "arrived": DriverStatusEffect("in_transit", "in_transit", "on_route", True),
+    "delivered": DriverStatusEffect("completed", "completed", "available", True),
+    "failed": DriverStatusEffect("failed", "failed", "available", False),
+    "issue_reported": DriverStatusEffect("in_transit", None, None, False),
 }
+NO_STATUS_EFFECT = DriverStatusEffect(None, None, None, False)
 
-DRIVER_STATUS_TO_ROUTE_STATUS: Dict[str, str] = {
-    "assigned": "pending",
-    "accepted": "pending",
-    "en_route": "in_transit",
-    "arrived": "in_transit",
-    "delivered": "completed",
-    "failed": "failed",
-}
+FINISHED_DRIVER_STATUSES = frozenset({"delivered", "failed", "completed", "cancelled"})
+
+DRIVER_FEED_ADAPTER = TypeAdapter(List[DriverOrderAssignment])
 
 
 def get_current_driver(
@@ -68,23 +100,26 @@ def get_current_driver(
     ),
     driver_id: Optional[int] = Query(
         default=None,
-        description="Temporary fallback for manual testing without tokens",
+        description="Specific driver ID (overrides authentication)",
     ),
 ) -> Driver:
     """
     Resolve the active driver from the X-Driver-Code header.
-    If no token is provided, uses the first available driver (for development/testing).
+    An explicit driver_id overrides the token's driver; if neither is given,
+    uses the first available driver (for development/testing).
     """
+    driver = None
     if x_driver_code:
         driver = db.query(Driver).filter(Driver.access_code == x_driver_code).first()
         if not driver:
             raise HTTPException(status_code=401, detail="Invalid driver token")
-        return driver
 
     if driver_id is not None:
-        driver = db.query(Driver).filter(Driver.id == driver_id).first()
+        driver = db.get(Driver, driver_id)
         if not driver:
             raise HTTPException(status_code=404, detail="Driver not found")
+
+    if driver:
         return driver
 
     # If no token provided, use the first available driver (for development)
@@ -95,13 +130,17 @@ def get_current_driver(
 
 
 def _route_assignment_map(driver: Driver, db: Session) -> Dict[int, RouteOrder]:
-    """Return the first RouteOrder per order for the provided driver, excluding completed/cancelled routes."""
+    """
+    Return the first RouteOrder per order for the provided driver, excluding completed/cancelled routes.
+    Each RouteOrder comes with its Order loaded (one extra IN query for all of them).
+    """
     assignments: Dict[int, RouteOrder] = {}
     # Get orders from routes that are not completed or cancelled
     # Route statuses: planned, active, completed, cancelled
     route_rows = (
         db.query(RouteOrder)
         .join(Route, Route.id == RouteOrder.route_id)
+        .options(selectinload(RouteOrder.order))
         .filter(
             Route.driver_id == driver.id,
             Route.status.notin_(["completed", "cancelled"])
@@ -115,38 +154,117 @@ def _route_assignment_map(driver: Driver, db: Session) -> Dict[int, RouteOrder]:
     return assignments
 
 
-def _validate_image_upload(content_type: Optional[str], field_name: str) -> None:
-    if content_type and content_type.lower() not in ALLOWED_IMAGE_TYPES:
-        raise HTTPException(
-            status_code=400,
-            detail=f"{field_name} must be an image ({', '.join(sorted(ALLOWED_IMAGE_TYPES))})",
-        )
+def _image_upload_suffix(file: UploadFile, field_name: str) -> str:
+    """
+    Validate an image upload and pick the stored file's suffix in one lookup.
+    Uploads without a content type fall back to their filename's suffix.
+    """
+    if file.content_type:
+        suffix = IMAGE_TYPE_SUFFIXES.get(file.content_type.lower())
+        if suffix is None:
+            raise HTTPException(
+                status_code=400,
+                detail=f"{field_name} must be an image ({', '.join(sorted(IMAGE_TYPE_SUFFIXES))})",
+            )
+        return suffix
+
+    suffix = Path(file.filename or "").suffix.lower()
+    return suffix if suffix in IMAGE_SUFFIX_WHITELIST else ".jpg"
 
 
-def _build_asset_filename(prefix: str, original_filename: Optional[str]) -> str:
-    suffix = Path(original_filename or "").suffix.lower()
-    if suffix not in IMAGE_SUFFIX_WHITELIST:
-        suffix = ".jpg"
-    return f"{prefix}_{uuid.uuid4().hex}{suffix}"
+def _build_asset_filename(prefix: str, suffix: str) -> str:
+    return f"{prefix}_{secrets.token_hex(8)}{suffix}"
+
+
+async def _stream_upload(file: UploadFile, destination: str) -> int:
+    """
+    Copy an upload to `destination` in UPLOAD_CHUNK_SIZE chunks and return its
+    size; aborts with 413 once it grows past MAX_UPLOAD_BYTES
+    """
+    size = 0
+    async with aiofiles.open(destination, "wb") as out_file:
+        while chunk := await file.read(UPLOAD_CHUNK_SIZE):
+            size += len(chunk)
+            if size > MAX_UPLOAD_BYTES:
+                raise HTTPException(status_code=413, detail="Uploaded file is too large")
+            await out_file.write(chunk)
+    return size
 
 
 async def _persist_upload_file(file: UploadFile, destination_dir: Path, prefix: str) -> Path:
-    _validate_image_upload(file.content_type, prefix)
-    content = await file.read()
-    if not content:
+    filename = _build_asset_filename(prefix, _image_upload_suffix(file, prefix))
+    destination = destination_dir / filename
+    try:
+        size = await _stream_upload(file, str(destination))
+    except Exception:
+        destination.unlink(missing_ok=True)
+        raise
+    if not size:
+        destination.unlink(missing_ok=True)
         raise HTTPException(status_code=400, detail=f"{prefix.capitalize()} file is empty")
+    return destination
 
-    filename = _build_asset_filename(prefix, file.filename)
-    destination = destination_dir / filename
-    destination.write_bytes(content)
+
+async def _persist_signature_data(signature_data: str, destination_dir: Path) -> Path:
+    signature_bytes = _decode_base64_image(signature_data)
+    destination = destination_dir / _build_asset_filename("signature", ".png")
+    async with aiofiles.open(destination, "wb") as buffer:
+        await buffer.write(signature_bytes)
     return destination
 
 
+async def _persist_proof_files(
+    photo: Optional[UploadFile],
+    signature: Optional[UploadFile],
+    signature_data: Optional[str],
+    destination_dir: Path,
+) -> Tuple[Optional[Path], Optional[Path]]:
+    """
+    Write the photo and signature concurrently and return their paths.
+    If either write fails, the other file is removed and the error is raised.
+    """
+    async def skip() -> None:
+        return None
+
+    photo_write = _persist_upload_file(photo, destination_dir, "photo") if photo else skip()
+    if signature:
+        signature_write = _persist_upload_file(signature, destination_dir, "signature")
+    elif signature_data:
+        signature_write = _persist_signature_data(signature_data, destination_dir)
+    else:
+        signature_write = skip()
+
+    results = await asyncio.gather(photo_write, signature_write, return_exceptions=True)
+    errors = [result for result in results if isinstance(result, BaseException)]
+    if errors:
+        for result in results:
+            if isinstance(result, Path):
+                result.unlink(missing_ok=True)
+        raise errors[0]
+    return results[0], results[1]
+
+
+async def _read_upload(file: UploadFile) -> Tuple[bytes, str]:
+    """
+    Read an upload into memory chunk by chunk and return its content and the
+    SHA-256 hex digest of it; aborts with 413 once it grows past MAX_UPLOAD_BYTES
+    """
+    content = bytearray()
+    digest = hashlib.sha256()
+    while chunk := await file.read(UPLOAD_CHUNK_SIZE):
+        if len(content) + len(chunk) > MAX_UPLOAD_BYTES:
+            raise HTTPException(status_code=413, detail="Uploaded file is too large")
+        digest.update(chunk)
+        content += chunk
+    return bytes(content), digest.hexdigest()
+
+
 def _decode_base64_image(payload: str) -> bytes:
     data = payload.split(",", 1)[1] if "," in payload else payload
     try:
-        return base64.b64decode(data)
-    except Exception as exc:  # pragma: no cover - defensive branch
+        # validate=True rejects non-alphabet characters up front instead of skipping them
+        return b64decode(data, validate=True)
+    except binascii.Error as exc:
         raise HTTPException(status_code=400, detail="Invalid signature payload") from exc
 
 
@@ -155,15 +273,6 @@ def _ensure_driver_can_access_order(order: Order, driver: Driver, db: Session) -
     Ensure the driver has access to the provided order either through a direct
     assignment or because the order exists on one of their routes.
     """
-    if order.assigned_driver_id == driver.id:
-        return (
-            db.query(RouteOrder)
-            .join(Route, Route.id == RouteOrder.route_id)
-            .filter(RouteOrder.order_id == order.id, Route.driver_id == driver.id)
-            .order_by(RouteOrder.sequence.asc())
-            .first()
-        )
-
     route_order = (
         db.query(RouteOrder)
         .join(Route, Route.id == RouteOrder.route_id)
@@ -172,6 +281,10 @@ def _ensure_driver_can_access_order(order: Order, driver: Driver, db: Session) -
         .first()
     )
 
+    # Directly assigned orders are accessible even when not on a route
+    if order.assigned_driver_id == driver.id:
+        return route_order
+
     if not route_order:
         raise HTTPException(status_code=403, detail="Order not assigned to this driver")
 
@@ -184,12 +297,14 @@ def _ensure_driver_can_access_order(order: Order, driver: Driver, db: Session) -
 
 
 def _build_driver_assignment(order: Order, route_order: Optional[RouteOrder]) -> DriverOrderAssignment:
-    return DriverOrderAssignment(
+    # The ORM row is read into OrderModel once; the route fields come straight
+    # from the database, so the wrapper skips validation
+    return DriverOrderAssignment.model_construct(
         route_id=route_order.route_id if route_order else None,
         route_order_id=route_order.id if route_order else None,
         route_sequence=route_order.sequence if route_order else None,
         route_status=route_order.status if route_order else order.driver_status,
-        order=order,
+        order=OrderModel.model_validate(order),
     )
 
 
@@ -199,59 +314,41 @@ def list_driver_orders_for_driver(
         False,
         description="Include delivered/failed orders in the driver feed",
     ),
-    driver_id: Optional[int] = Query(
-        None,
-        description="Specific driver ID to get orders for (overrides authentication)",
-    ),
     driver: Driver = Depends(get_current_driver),
     db: Session = Depends(get_db),
 ):
-    # If driver_id is specified, use that driver instead
-    if driver_id is not None:
-        specified_driver = db.query(Driver).filter(Driver.id == driver_id).first()
-        if not specified_driver:
-            raise HTTPException(status_code=404, detail="Driver not found")
-        driver = specified_driver
-
     assignments = _route_assignment_map(driver, db)
-    orders_by_id: Dict[int, Order] = {}
-
-    # Only include orders that are in active routes
-    # This ensures drivers only see orders that are part of their planned routes
-    if assignments:
-        order_ids = list(assignments.keys())
-        route_orders = db.query(Order).filter(Order.id.in_(order_ids)).all()
-        for order in route_orders:
-            orders_by_id[order.id] = order
 
     def is_completed(order: Order) -> bool:
         status = (order.driver_status or order.status or "").lower()
-        return status in {"delivered", "failed", "completed", "cancelled"}
-
-    # Sort orders: prioritize route_sequence when available, then by timestamp
-    def sort_key(order: Order) -> tuple:
-        route_order = assignments.get(order.id)
-        if route_order and route_order.sequence is not None:
-            # Orders with route sequence come first, sorted by sequence
-            return (0, route_order.sequence)
+        return status in FINISHED_DRIVER_STATUSES
+
+    # Only include orders that are in active routes
+    # This ensures drivers only see orders that are part of their planned routes.
+    # Assignments arrive ordered by route sequence, so orders with a sequence
+    # keep that order; the rest follow, sorted by timestamp (newest first).
+    sequenced: List[Tuple[Order, RouteOrder]] = []
+    unsequenced: List[Tuple[float, Order, RouteOrder]] = []
+    for route_order in assignments.values():
+        order = route_order.order
+        if order is None or (not include_completed and is_completed(order)):
+            continue
+        if route_order.sequence is not None:
+            sequenced.append((order, route_order))
         else:
-            # Orders without route sequence come after, sorted by timestamp (newest first)
             timestamp = order.driver_status_updated_at or order.updated_at or order.created_at
-            return (1, -(timestamp.timestamp() if timestamp else 0))
-
-    sorted_orders = sorted(
-        orders_by_id.values(),
-        key=sort_key,
+            unsequenced.append((timestamp.timestamp() if timestamp else 0, order, route_order))
+    unsequenced.sort(key=lambda item: item[0], reverse=True)
+
+    payload: List[DriverOrderAssignment] = [
+        _build_driver_assignment(order, route_order) for order, route_order in sequenced
+    ]
+    payload.extend(
+        _build_driver_assignment(order, route_order) for _, order, route_order in unsequenced
     )
-
-    payload: List[DriverOrderAssignment] = []
-    for order in sorted_orders:
-        if not include_completed and is_completed(order):
-            continue
-        route_order = assignments.get(order.id)
-        payload.append(_build_driver_assignment(order, route_order))
-
-    return payload
+    # Already validated above; serialize directly instead of letting the
+    # response_model validate every order a second time
+    return Response(content=DRIVER_FEED_ADAPTER.dump_json(payload), media_type="application/json")
 
 
 @router.get("/driver/orders/{order_id}", response_model=DriverOrderAssignment)
@@ -260,23 +357,18 @@ def get_driver_order_detail(
     driver: Driver = Depends(get_current_driver),
     db: Session = Depends(get_db),
 ):
-    order = db.query(Order).filter(Order.id == order_id).first()
+    order = db.get(Order, order_id)
     if not order:
         raise HTTPException(status_code=404, detail="Order not found")
 
     route_order = _ensure_driver_can_access_order(order, driver, db)
     db.commit()
-    db.refresh(order)
     return _build_driver_assignment(order, route_order)
 
 
 @router.get("/driver/orders/{order_id}/directions")
 def get_driver_order_directions(
     order_id: int,
-    driver_id: Optional[int] = Query(
-        None,
-        description="Specific driver ID (overrides authentication)",
-    ),
     driver: Driver = Depends(get_current_driver),
     db: Session = Depends(get_db),
 ):
@@ -284,18 +376,7 @@ def get_driver_order_directions(
     Get turn-by-turn directions for a specific order.
     Returns route visualization and navigation instructions.
     """
-    from ..database import Route, RouteOrder, Depot
-    from ..services.osrm_client import get_route, check_osrm_available
-    from ..services.route_calculator import calculate_complete_route
-
-    # If driver_id is specified, use that driver instead
-    if driver_id is not None:
-        specified_driver = db.query(Driver).filter(Driver.id == driver_id).first()
-        if not specified_driver:
-            raise HTTPException(status_code=404, detail="Driver not found")
-        driver = specified_driver
-
-    order = db.query(Order).filter(Order.id == order_id).first()
+    order = db.get(Order, order_id)
     if not order:
         raise HTTPException(status_code=404, detail="Order not found")
 
@@ -303,20 +384,24 @@ def get_driver_order_directions(
     if not route_order:
         raise HTTPException(status_code=404, detail="Order not found in any route")
 
-    # Get the route
-    route = db.query(Route).filter(Route.id == route_order.route_id).first()
+    # Get the route with its stops, their orders and its driver in one pass
+    route = db.get(
+        Route,
+        route_order.route_id,
+        options=[
+            selectinload(Route.route_orders).selectinload(RouteOrder.order),
+            joinedload(Route.driver),
+        ],
+    )
     if not route:
         raise HTTPException(status_code=404, detail="Route not found")
 
-    # Get all route orders for this route
-    all_route_orders = db.query(RouteOrder).filter(
-        RouteOrder.route_id == route.id
-    ).order_by(RouteOrder.sequence).all()
+    all_route_orders = sorted(route.route_orders, key=lambda ro: ro.sequence)
 
     # Get depot
-    depot = db.query(Depot).first()
+    depot = get_default_depot(db)
     if not depot:
-        driver = db.query(Driver).filter(Driver.id == route.driver_id).first()
+        driver = route.driver
         if driver and driver.current_location_lat and driver.current_location_lng:
             depot_dict = {
                 "id": None,
@@ -346,7 +431,7 @@ def get_driver_order_directions(
     orders_data = []
     target_order_idx = None
     for idx, ro in enumerate(all_route_orders):
-        o = db.query(Order).filter(Order.id == ro.order_id).first()
+        o = ro.order
         if o and o.latitude and o.longitude:
             orders_data.append({
                 "id": o.id,
@@ -365,7 +450,6 @@ def get_driver_order_directions(
 
     # Calculate complete route
     try:
-        from datetime import datetime
         complete_route = calculate_complete_route(
             depot=depot_dict,
             orders=orders_data,
@@ -380,57 +464,53 @@ def get_driver_order_directions(
     directions = []
     waypoints = complete_route["waypoints"]
 
-    if check_osrm_available() and len(waypoints) >= 2:
-        # Get directions for each segment
-        for i in range(len(waypoints) - 1):
-            current = waypoints[i]
-            next_wp = waypoints[i + 1]
-
-            route_data = get_route(
-                current["lat"], current["lon"],
-                next_wp["lat"], next_wp["lon"],
-                steps=True,
-                overview="full",
-                geometries="geojson"
-            )
+    if len(waypoints) >= 2:
+        # One request for the whole route; OSRM returns a leg per waypoint segment
+        route_data = get_route_multi(
+            [(wp["lat"], wp["lon"]) for wp in waypoints],
+            steps=True,
+            overview="full",
+            geometries="geojson"
+        )
+        legs = route_data.get("legs", []) if route_data else []
 
-            if route_data and route_data.get("legs") and len(route_data["legs"]) > 0:
-                leg = route_data["legs"][0]
-                # OSRM returns steps in leg.steps when steps=true
-                steps = leg.get("steps", [])
-                for step in steps:
-                    maneuver = step.get("maneuver", {})
-                    instruction_text = maneuver.get("instruction", "")
-                    if not instruction_text:
-                        # Fallback: create instruction from type and modifier
-                        maneuver_type = maneuver.get("type", "")
-                        modifier = maneuver.get("modifier", "")
-                        if maneuver_type == "turn":
-                            if modifier:
-                                instruction_text = f"Turn {modifier}"
-                            else:
-                                instruction_text = "Turn"
-                        elif maneuver_type == "new name":
-                            instruction_text = "Continue straight"
-                        elif maneuver_type == "depart":
-                            instruction_text = "Start"
-                        elif maneuver_type == "arrive":
-                            instruction_text = "Arrive at destination"
+        for i, leg in enumerate(legs[:len(waypoints) - 1]):
+            current = waypoints[i]
+            # OSRM returns steps in leg.steps when steps=true
+            steps = leg.get("steps", [])
+            for step in steps:
+                maneuver = step.get("maneuver", {})
+                instruction_text = maneuver.get("instruction", "")
+                if not instruction_text:
+                    # Fallback: create instruction from type and modifier
+                    maneuver_type = maneuver.get("type", "")
+                    modifier = maneuver.get("modifier", "")
+                    if maneuver_type == "turn":
+                        if modifier:
+                            instruction_text = f"Turn {modifier}"
                         else:
-                            instruction_text = maneuver_type.replace("_", " ").title()
-
-                    directions.append({
-                        "distance": step.get("distance", 0),  # meters
-                        "duration": step.get("duration", 0),  # seconds
-                        "instruction": instruction_text,
-                        "type": maneuver.get("type", ""),
-                        "modifier": maneuver.get("modifier", ""),
-                        "geometry": step.get("geometry"),
-                        "waypoint_index": i,
-                        "waypoint_type": current.get("type", "unknown")
-                    })
-
-    return {
+                            instruction_text = "Turn"
+                    elif maneuver_type == "new name":
+                        instruction_text = "Continue straight"
+                    elif maneuver_type == "depart":
+                        instruction_text = "Start"
+                    elif maneuver_type == "arrive":
+                        instruction_text = "Arrive at destination"
+                    else:
+                        instruction_text = maneuver_type.replace("_", " ").title()
+
+                directions.append({
+                    "distance": step.get("distance", 0),  # meters
+                    "duration": step.get("duration", 0),  # seconds
+                    "instruction": instruction_text,
+                    "type": maneuver.get("type", ""),
+                    "modifier": maneuver.get("modifier", ""),
+                    "geometry": step.get("geometry"),
+                    "waypoint_index": i,
+                    "waypoint_type": current.get("type", "unknown")
+                })
+
+    return json_response({
         "order_id": order_id,
         "route_id": route.id,
         "route_name": route.name,
@@ -449,28 +529,17 @@ def get_driver_order_directions(
         "total_distance_km": complete_route["total_distance_km"],
         "total_time_minutes": complete_route["total_time_minutes"],
         "target_order_index": target_order_idx
-    }
+    })
 
 
 @router.post("/driver/orders/{order_id}/status", response_model=OrderModel)
 def update_driver_order_status(
     order_id: int,
     payload: DriverStatusUpdateRequest,
-    driver_id: Optional[int] = Query(
-        None,
-        description="Specific driver ID (overrides authentication)",
-    ),
     driver: Driver = Depends(get_current_driver),
     db: Session = Depends(get_db),
 ):
-    # If driver_id is specified, use that driver instead
-    if driver_id is not None:
-        specified_driver = db.query(Driver).filter(Driver.id == driver_id).first()
-        if not specified_driver:
-            raise HTTPException(status_code=404, detail="Driver not found")
-        driver = specified_driver
-
-    order = db.query(Order).filter(Order.id == order_id).first()
+    order = db.get(Order, order_id)
     if not order:
         raise HTTPException(status_code=404, detail="Order not found")
 
@@ -486,32 +555,50 @@ def update_driver_order_status(
     order.driver_gps_lng = payload.gps_lng
     order.driver_status_updated_at = now
 
-    mapped_status = DRIVER_STATUS_TO_ORDER_STATUS.get(normalized_status)
-    if mapped_status:
-        order.status = mapped_status
+    effect = DRIVER_STATUS_EFFECTS.get(normalized_status, NO_STATUS_EFFECT)
+    if effect.order_status:
+        order.status = effect.order_status
     if normalized_status == "delivered":
         order.delivered_at = now
     if normalized_status == "failed":
         order.failed_at = now
 
     if route_order:
-        route_status = DRIVER_STATUS_TO_ROUTE_STATUS.get(normalized_status)
-        if route_status:
-            route_order.status = route_status
-        if normalized_status in {"arrived", "delivered"}:
+        if effect.route_status:
+            route_order.status = effect.route_status
+        if effect.marks_arrival:
             route_order.actual_arrival = route_order.actual_arrival or now
 
     driver.last_check_in_at = now
-    if normalized_status in {"accepted", "en_route", "arrived"}:
-        driver.status = "on_route"
-    elif normalized_status in {"delivered", "failed"}:
-        driver.status = "available"
+    if effect.driver_status:
+        driver.status = effect.driver_status
 
     db.commit()
-    db.refresh(order)
     return order
 
 
+def _load_proof_order(
+    order_id: int,
+    driver: Driver,
+    driver_id: Optional[int],
+    db: Session,
+) -> Tuple[Driver, Order, Optional[RouteOrder]]:
+    """Blocking lookups for the proof upload, run in the threadpool"""
+    # If driver_id is specified, use that driver instead
+    if driver_id is not None:
+        specified_driver = db.get(Driver, driver_id)
+        if not specified_driver:
+            raise HTTPException(status_code=404, detail="Driver not found")
+        driver = specified_driver
+
+    order = db.get(Order, order_id)
+    if not order:
+        raise HTTPException(status_code=404, detail="Order not found")
+
+    route_order = _ensure_driver_can_access_order(order, driver, db)
+    return driver, order, route_order
+
+
 @router.post("/driver/orders/{order_id}/proof", response_model=OrderModel)
 async def upload_driver_proof_of_delivery(
     order_id: int,
@@ -538,42 +625,22 @@ async def upload_driver_proof_of_delivery(
     Upload proof-of-delivery artifacts (photo + signature).
     Drivers must supply their X-Driver-Code header. Files are stored under uploads/proof/.
     """
-    # If driver_id is specified, use that driver instead
-    if driver_id is not None:
-        specified_driver = db.query(Driver).filter(Driver.id == driver_id).first()
-        if not specified_driver:
-            raise HTTPException(status_code=404, detail="Driver not found")
-        driver = specified_driver
-
-    order = db.query(Order).filter(Order.id == order_id).first()
-    if not order:
-        raise HTTPException(status_code=404, detail="Order not found")
-
-    route_order = _ensure_driver_can_access_order(order, driver, db)
+    driver, order, route_order = await run_in_threadpool(
+        _load_proof_order, order_id, driver, driver_id, db
+    )
 
     if not any([photo, signature, signature_data]):
         raise HTTPException(status_code=400, detail="Provide at least a photo or signature payload")
 
-    PROOF_UPLOAD_DIR.mkdir(parents=True, exist_ok=True)
+    # Also creates PROOF_UPLOAD_DIR on first use, off the event loop
     order_dir = PROOF_UPLOAD_DIR / f"order_{order_id}"
-    order_dir.mkdir(parents=True, exist_ok=True)
-
-    saved_photo = None
-    saved_signature = None
+    await aiofiles.os.makedirs(order_dir, exist_ok=True)
 
-    if photo:
-        saved_photo = await _persist_upload_file(photo, order_dir, "photo")
+    saved_photo, saved_signature = await _persist_proof_files(photo, signature, signature_data, order_dir)
+    if saved_photo:
         order.proof_photo_path = str(saved_photo)
-
-    if signature:
-        saved_signature = await _persist_upload_file(signature, order_dir, "signature")
+    if saved_signature:
         order.proof_signature_path = str(saved_signature)
-    elif signature_data:
-        signature_bytes = _decode_base64_image(signature_data)
-        filename = order_dir / _build_asset_filename("signature", "signature.png")
-        filename.write_bytes(signature_bytes)
-        order.proof_signature_path = str(filename)
-        saved_signature = filename
 
     now = datetime.utcnow()
     metadata = order.proof_metadata or {}
@@ -610,61 +677,135 @@ async def upload_driver_proof_of_delivery(
         route_order.status = "completed"
         route_order.actual_arrival = route_order.actual_arrival or now
 
-    db.commit()
-    db.refresh(order)
+    await run_in_threadpool(db.commit)
     return order
 
 
-def generate_order_number(db: Session) -> str:
-    """Generate order number in format ORD-ddmmyy-XXXX"""
-    now = datetime.now()
-    date_str = now.strftime("%d%m%y")  # ddmmyy format
-
-    # Find the highest sequential number for today
-    prefix = f"ORD-{date_str}-"
+def insert_order(db: Session, db_order: Order) -> Order:
+    """
+    Add and flush a new order, relying on the unique index on order_number.
+    If a provided number is already taken, it is dropped and the Order model
+    default numbers the order instead.
+    """
+    for attempt in range(ORDER_INSERT_ATTEMPTS):
+        db.add(db_order)
+        try:
+            db.flush()
+            return db_order
+        except IntegrityError:
+            db.rollback()
+            if attempt == ORDER_INSERT_ATTEMPTS - 1:
+                raise
+            db_order.order_number = None
+    return db_order
 
-    # Query all orders with today's prefix
-    existing_orders = db.query(Order.order_number).filter(
-        Order.order_number.like(f"{prefix}%")
-    ).all()
 
-    max_seq = 0
-    for order_num_tuple in existing_orders:
-        order_num = order_num_tuple[0]
-        # Extract the 4-digit sequence number
-        match = re.search(rf"^{re.escape(prefix)}(\d{{4}})$", order_num)
-        if match:
-            seq_num = int(match.group(1))
-            max_seq = max(max_seq, seq_num)
+def assign_batch_order_numbers(orders: List[OrderCreate], db: Session) -> None:
+    """
+    Check a batch's provided order numbers with one lookup and drop the ones
+    that are taken or repeated; the Order model default numbers the rest in a
+    single pass when the batch is flushed.
+    """
+    provided = {order.order_number for order in orders if order.order_number}
+    taken = set()
+    if provided:
+        taken = {
+            row[0]
+            for row in db.query(Order.order_number).filter(Order.order_number.in_(provided)).all()
+        }
 
-    # Increment and format as 4-digit zero-padded number
-    next_seq = max_seq + 1
-    return f"{prefix}{next_seq:04d}"
+    for order in orders:
+        if not order.order_number:
+            continue
+        if order.order_number in taken:
+            order.order_number = None
+        else:
+            taken.add(order.order_number)
+
+
+PARSED_ORDER_FIELDS = (
+    "order_number",
+    "delivery_address",
+    "customer_name",
+    "customer_phone",
+    "customer_email",
+    "description",
+    "items",
+    "delivery_time_window_start",
+    "delivery_time_window_end",
+    "raw_text",
+)
 
 
-def ensure_unique_order_number(order_data: OrderCreate, db: Session) -> OrderCreate:
-    """Ensure order_number is unique, generate new one if missing or conflicting"""
-    if not order_data.order_number:
-        # Generate a new order number if none provided
-        order_data.order_number = generate_order_number(db)
+def _order_create_from_parsed(parsed_data: Dict, source: Optional[str], **overrides) -> OrderCreate:
+    """Validate parser output into an OrderCreate in one pass (priority is derived later)"""
+    payload = {field: parsed_data.get(field) for field in PARSED_ORDER_FIELDS}
+    payload["delivery_address"] = payload["delivery_address"] or ""
+    payload.update(overrides, source=source, priority=None)
+    return OrderCreate.model_validate(payload)
+
+
+async def _parse_uploaded_document(file: UploadFile) -> Dict:
+    """Read an uploaded document into memory and parse it"""
+    content, content_hash = await _read_upload(file)
+    # Only the extension of the client filename is used, to pick the parser
+    filename = os.path.basename(file.filename) if file.filename else "upload"
+    # Identical re-uploads reuse the earlier parse
+    return await parse_document(content, filename, content_hash=content_hash)
+
+
+async def _ingest_order(
+    source: str,
+    db: Session,
+    file: Optional[UploadFile] = None,
+    text_body: Optional[str] = None,
+    sender_email: Optional[str] = None,
+) -> Order:
+    """Parse an uploaded document, or failing that a text body, and persist it as a new order"""
+    if file:
+        parsed_data = await _parse_uploaded_document(file)
+    elif text_body:
+        parsed_data = await run_in_threadpool(parse_order_from_text, text_body)
     else:
-        # Check if the provided order number already exists
-        existing_order = db.query(Order).filter(Order.order_number == order_data.order_number).first()
-        if existing_order:
-            # Generate a new unique order number in the correct format
-            order_data.order_number = generate_order_number(db)
-    return order_data
+        raise HTTPException(status_code=400, detail="Either attachment or email_body must be provided")
+
+    order_data = _order_create_from_parsed(
+        parsed_data,
+        source=source,
+        raw_text=parsed_data.get("raw_text") or text_body,
+        customer_email=sender_email or parsed_data.get("customer_email"),
+    )
+    # Geocoding, validation and the insert block, keep them off the event loop
+    return await run_in_threadpool(create_order_record, order_data, db)
+
+
+def create_order_record(order_data: OrderCreate, db: Session) -> Order:
+    """Prepare, insert and commit a single order (blocking; async handlers run it in the threadpool)"""
+    db_order = prepare_order_for_db(order_data, db)
+    insert_order(db, db_order)
+    db.commit()
+    return db_order
 
 
 def prepare_order_for_db(order_data: OrderCreate, db: Session) -> Order:
     """
     Normalize an OrderCreate payload before persisting:
-    - ensure unique order number
     - auto-calculate priority when missing
     - geocode addresses via OSM (Nominatim) when coordinates missing
     - run validation and attach validation errors
     """
-    order_data = ensure_unique_order_number(order_data, db)
+    return Order(**prepare_order_values(order_data))
+
+
+def _needs_geocoding(order_data: OrderCreate) -> bool:
+    return bool(order_data.delivery_address) and (not order_data.latitude or not order_data.longitude)
+
+
+def prepare_order_values(order_data: OrderCreate, geocode: bool = True) -> Dict:
+    """
+    Normalize an OrderCreate payload (see prepare_order_for_db) into Order column values.
+    Pass geocode=False when the caller has already geocoded the address.
+    """
     if not order_data.driver_status:
         order_data.driver_status = "unassigned"
 
@@ -674,30 +815,24 @@ def prepare_order_for_db(order_data: OrderCreate, db: Session) -> Order:
             order_data.delivery_time_window_end
         )
 
-    if order_data.delivery_address and (
-        not order_data.latitude or not order_data.longitude
-    ):
+    if geocode and _needs_geocoding(order_data):
         coords = geocode_address(order_data.delivery_address)
         if coords:
             order_data.latitude = coords["lat"]
             order_data.longitude = coords["lon"]
 
     validation_errors = validate_order(order_data)
-    order_dict = order_data.dict()
-    db_order = Order(**order_dict)
+    order_values = order_data.model_dump()
     if validation_errors:
-        db_order.validation_errors = validation_errors
+        order_values["validation_errors"] = validation_errors
 
-    return db_order
+    return order_values
 
 
 @router.post("/", response_model=OrderModel)
 def create_order(order: OrderCreate, db: Session = Depends(get_db)):
     """Create a new order"""
-    db_order = prepare_order_for_db(order, db)
-    db.add(db_order)
-    db.commit()
-    db.refresh(db_order)
+    db_order = create_order_record(order, db)
     return db_order
 
 
@@ -707,125 +842,217 @@ def create_orders_bulk(orders: List[OrderCreate], db: Session = Depends(get_db))
     Create multiple orders in a single transaction.
     Handles geocoding for addresses without coordinates and generates unique order numbers.
     """
-    created_orders = []
-
     try:
-        for order in orders:
-            db_order = prepare_order_for_db(order, db)
-            db.add(db_order)
-            db.flush()  # Ensure generated order numbers are visible for subsequent inserts
-            created_orders.append(db_order)
-
+        assign_batch_order_numbers(orders, db)
+
+        # Geocode the batch's distinct addresses concurrently instead of one by one
+        to_geocode = [order for order in orders if _needs_geocoding(order)]
+        coords_by_address = geocode_addresses(order.delivery_address for order in to_geocode)
+        for order in to_geocode:
+            coords = coords_by_address[order.delivery_address]
+            if coords:
+                order.latitude = coords["lat"]
+                order.longitude = coords["lon"]
+
+        rows = [prepare_order_values(order, geocode=False) for order in orders]
+
+        # Number the batch up front: the bulk INSERT below skips the flush-time default
+        new_numbers = iter(generate_order_numbers(db, sum(1 for row in rows if not row["order_number"])))
+        for row in rows:
+            row["order_number"] = row["order_number"] or next(new_numbers)
+            row["priority_rank"] = priority_rank_for(row["priority"])
+
+        # One executemany INSERT without per-instance ORM bookkeeping, then read
+        # the rows back by their unique order numbers for the response
+        db.execute(insert(Order), rows)
+        numbers = [row["order_number"] for row in rows]
+        created_by_number = {
+            order.order_number: order
+            for order in db.query(Order).filter(Order.order_number.in_(numbers))
+        }
         db.commit()
 
-        # Refresh all orders to get IDs
-        for order in created_orders:
-            db.refresh(order)
-
-        return created_orders
+        return [created_by_number[number] for number in numbers]
 
     except Exception as e:
         db.rollback()
         raise HTTPException(status_code=400, detail=f"Error creating orders: {str(e)}")
 
 
-@router.get("/", response_model=List[OrderModel])
+def _encode_order_cursor(order: Order) -> str:
+    """Opaque keyset cursor for the default (priority_rank, created_at desc nulls last, id desc) order"""
+    created_at = order.created_at.isoformat() if order.created_at else ""
+    raw = f"{order.priority_rank}|{created_at}|{order.id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def _order_cursor_filter(cursor: str):
+    """Rows that sort strictly after the cursor position in the default order"""
+    try:
+        rank, created_at, order_id = base64.urlsafe_b64decode(cursor.encode()).decode().split("|")
+        rank, order_id = int(rank), int(order_id)
+        created_at = datetime.fromisoformat(created_at) if created_at else None
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+    # Mixed sort directions rule out a plain tuple comparison, so spell it out.
+    # Rows without created_at sort after all dated ones within their rank.
+    if created_at is None:
+        same_rank_after = and_(Order.created_at.is_(None), Order.id < order_id)
+    else:
+        same_rank_after = or_(
+            Order.created_at < created_at,
+            and_(Order.created_at == created_at, Order.id < order_id),
+            Order.created_at.is_(None),
+        )
+    return or_(
+        Order.priority_rank > rank,
+        and_(Order.priority_rank == rank, same_rank_after),
+    )
+
+
+@router.get("/", response_model=List[OrderListItem])
 def get_orders(
+    response: Response,
     status: Optional[str] = None,
     source: Optional[str] = None,
     unfinished: Optional[bool] = None,
+    after_id: Optional[int] = None,
+    cursor: Optional[str] = None,
     skip: int = 0,
     limit: int = 100,
+    if_none_match: Optional[str] = Header(None),
     db: Session = Depends(get_db)
 ):
-    """Get all orders with optional filters"""
-    query = db.query(Order)
+    """
+    Get all orders with optional filters, sorted by priority then newest first.
+    Full pages carry an X-Next-Cursor header; passing it back as cursor fetches
+    the next page by keyset instead of OFFSET, which stays fast on deep pages.
+    after_id (0 for the first page, then X-Next-Cursor) pages in id order instead.
+    Answers 304 when If-None-Match is still current.
+    """
+    # The cursor already encodes the position: an offset on top would drop rows
+    # from every page, and after_id pages in a different order
+    if cursor is not None and (skip or after_id is not None):
+        raise HTTPException(status_code=400, detail="cursor cannot be combined with skip or after_id")
 
+    filters = []
     if status:
-        query = query.filter(Order.status == status)
+        filters.append(Order.status == status)
     if source:
-        query = query.filter(Order.source == source)
+        filters.append(Order.source == source)
     if unfinished is not None and unfinished:
         # Unfinished orders: have validation errors or missing critical fields
-        query = query.filter(
+        filters.append(
             or_(
-                # Has validation errors (not None - empty lists will be filtered in Python)
-                Order.validation_errors.isnot(None),
+                # Has a non-empty list of validation errors. None is stored as
+                # JSON 'null', and PostgreSQL's json_array_length raises on
+                # scalars, so only arrays reach it (SQLite and PostgreSQL only)
+                case(
+                    (
+                        json_type(Order.validation_errors) == "array",
+                        func.json_array_length(Order.validation_errors) > 0,
+                    ),
+                    else_=False,
+                ),
                 # Missing delivery address
-                Order.delivery_address == None,
-                Order.delivery_address == ""
+                Order.delivery_address.is_(None),
+                func.trim(Order.delivery_address) == ""
             )
         )
 
-    # Sort orders: priority first (urgent > high > normal > low), then by created_at (newest first)
-    # Apply sorting
-    query = query.order_by(
-        # Sort by priority (custom order)
-        case(
-            (Order.priority == 'urgent', 1),
-            (Order.priority == 'high', 2),
-            (Order.priority == 'normal', 3),
-            (Order.priority == 'low', 4),
-            else_=5  # Unknown/null priority goes last
-        ),
-        # Then by created_at descending (newest first)
-        Order.created_at.desc()
-    )
+    # Any insert, update or delete in the filtered set changes its row count or
+    # latest updated_at, so those two tag every page of it
+    row_count, last_updated = db.query(func.count(Order.id), func.max(Order.updated_at)).filter(*filters).one()
+    etag = compute_etag(status, source, unfinished, after_id, cursor, skip, limit, row_count, last_updated)
+    if etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers={"ETag": etag})
+    response.headers["ETag"] = etag
+
+    # Skip the wide text/JSON columns the list schema leaves out, and fail loudly
+    # instead of lazy loading per row if anything touches them or a relationship
+    query = db.query(Order).options(
+        defer(Order.raw_text, raiseload=True),
+        defer(Order.proof_metadata, raiseload=True),
+        raiseload("*"),
+    ).filter(*filters)
+
+    if after_id is not None:
+        query = query.filter(Order.id > after_id).order_by(Order.id)
+    else:
+        if cursor:
+            query = query.filter(_order_cursor_filter(cursor))
+        # Sort orders: priority first (urgent > high > normal > low, unknown last),
+        # then by created_at (newest first); served by ix_orders_rank_created.
+        # id breaks ties so the cursor position is unambiguous.
+        query = query.order_by(Order.priority_rank, Order.created_at.desc().nulls_last(), Order.id.desc())
 
     orders = query.offset(skip).limit(limit).all()
-
-    # Filter out orders with empty validation_errors lists (they're not unfinished)
-    if unfinished is not None and unfinished:
-        orders = [
-            order for order in orders
-            if (
-                # Has non-empty validation errors
-                (order.validation_errors is not None and
-                 isinstance(order.validation_errors, list) and
-                 len(order.validation_errors) > 0) or
-                # Missing delivery address
-                not order.delivery_address or
-                order.delivery_address.strip() == ""
-            )
-        ]
+    if orders and len(orders) == limit:
+        if after_id is not None:
+            response.headers["X-Next-Cursor"] = str(orders[-1].id)
+        else:
+            response.headers["X-Next-Cursor"] = _encode_order_cursor(orders[-1])
 
     return orders
 
 
 @router.get("/{order_id}", response_model=OrderModel)
-def get_order(order_id: int, db: Session = Depends(get_db)):
-    """Get a specific order by ID"""
-    order = db.query(Order).filter(Order.id == order_id).first()
-    if not order:
+def get_order(
+    order_id: int,
+    response: Response,
+    if_none_match: Optional[str] = Header(None),
+    db: Session = Depends(get_db)
+):
+    """Get a specific order by ID (answers 304 when If-None-Match is current)"""
+    # Revalidate against updated_at alone before loading the full row
+    version = db.query(Order.updated_at).filter(Order.id == order_id).first()
+    if not version:
         raise HTTPException(status_code=404, detail="Order not found")
+
+    etag = compute_etag(order_id, version.updated_at)
+    if etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers={"ETag": etag})
+
+    order = db.get(Order, order_id)
+    response.headers["ETag"] = etag
     return order
 
 
 @router.put("/{order_id}", response_model=OrderModel)
 def update_order(order_id: int, order_update: OrderUpdate, db: Session = Depends(get_db)):
     """Update an order"""
-    db_order = db.query(Order).filter(Order.id == order_id).first()
+    update_data = order_update.model_dump(exclude_unset=True)
+    if not update_data:
+        db_order = db.get(Order, order_id)
+        if not db_order:
+            raise HTTPException(status_code=404, detail="Order not found")
+        return db_order
+
+    # Bulk UPDATE bypasses the priority validator, so keep the sort rank in sync here
+    if "priority" in update_data:
+        update_data["priority_rank"] = priority_rank_for(update_data["priority"])
+
+    # One UPDATE ... RETURNING instead of loading the row first (updated_at is set by onupdate)
+    db_order = db.scalars(
+        update(Order).where(Order.id == order_id).values(**update_data).returning(Order)
+    ).one_or_none()
     if not db_order:
+        db.rollback()
         raise HTTPException(status_code=404, detail="Order not found")
 
-    update_data = order_update.dict(exclude_unset=True)
-    for field, value in update_data.items():
-        setattr(db_order, field, value)
-
-    db_order.updated_at = datetime.utcnow()
     db.commit()
-    db.refresh(db_order)
     return db_order
 
 
 @router.delete("/{order_id}")
 def delete_order(order_id: int, db: Session = Depends(get_db)):
-    """Delete an order"""
-    db_order = db.query(Order).filter(Order.id == order_id).first()
-    if not db_order:
+    """Delete an order and remove it from any route"""
+    deleted = delete_order_rows(db, order_id)
+    if not deleted:
+        db.rollback()
         raise HTTPException(status_code=404, detail="Order not found")
 
-    db.delete(db_order)
     db.commit()
     return {"message": "Order deleted successfully"}
 
@@ -837,59 +1064,11 @@ async def upload_order_document(
     db: Session = Depends(get_db)
 ):
     """Upload and parse order from document (email attachment, fax, mail scan)"""
-    from ..services.order_parser import parse_document
-
-    # Save uploaded file temporarily
-    import aiofiles
-    import os
-    from pathlib import Path
-    import uuid
-
-    os.makedirs("uploads", exist_ok=True)
-    # Use a unique filename to avoid conflicts and path traversal issues
-    safe_filename = os.path.basename(file.filename) if file.filename else "upload"
-    file_ext = Path(safe_filename).suffix
-    unique_filename = f"{uuid.uuid4().hex}{file_ext}"
-    file_path = os.path.join("uploads", unique_filename)
-
-    async with aiofiles.open(file_path, 'wb') as out_file:
-        content = await file.read()
-        await out_file.write(content)
-
-    # Parse document
     try:
-        parsed_data = await parse_document(file_path)
-
-        # Create order from parsed data
-        order_data = OrderCreate(
-            order_number=parsed_data.get("order_number"),
-            delivery_address=parsed_data.get("delivery_address", ""),
-            customer_name=parsed_data.get("customer_name"),
-            customer_phone=parsed_data.get("customer_phone"),
-            customer_email=parsed_data.get("customer_email"),
-            description=parsed_data.get("description"),
-            items=parsed_data.get("items"),
-            delivery_time_window_start=parsed_data.get("delivery_time_window_start"),
-            delivery_time_window_end=parsed_data.get("delivery_time_window_end"),
-            priority=None,  # Will be calculated automatically
-            source=source,
-            raw_text=parsed_data.get("raw_text")
-        )
-
-        db_order = prepare_order_for_db(order_data, db)
-        db.add(db_order)
-        db.commit()
-        db.refresh(db_order)
-
-        # Clean up uploaded file
-        os.remove(file_path)
-
-        return db_order
-
+        return await _ingest_order(source, db, file=file)
+    except HTTPException:
+        raise
     except Exception as e:
-        # Clean up on error
-        if os.path.exists(file_path):
-            os.remove(file_path)
         raise HTTPException(status_code=400, detail=f"Error parsing document: {str(e)}")
 
 
@@ -929,25 +1108,9 @@ def parse_order_text(
         source = request.source
         parsed_data = parse_order_from_text(text)
 
-        order_data = OrderCreate(
-            order_number=parsed_data.get("order_number"),
-            delivery_address=parsed_data.get("delivery_address", ""),
-            customer_name=parsed_data.get("customer_name"),
-            customer_phone=parsed_data.get("customer_phone"),
-            customer_email=parsed_data.get("customer_email"),
-            description=parsed_data.get("description"),
-            items=parsed_data.get("items"),
-            delivery_time_window_start=parsed_data.get("delivery_time_window_start"),
-            delivery_time_window_end=parsed_data.get("delivery_time_window_end"),
-            priority=None,  # Will be calculated automatically
-            source=source,
-            raw_text=text
-        )
+        order_data = _order_create_from_parsed(parsed_data, source=source, raw_text=text)
 
-        db_order = prepare_order_for_db(order_data, db)
-        db.add(db_order)
-        db.commit()
-        db.refresh(db_order)
+        db_order = create_order_record(order_data, db)
 
         return db_order
 
@@ -955,6 +1118,24 @@ def parse_order_text(
         raise HTTPException(status_code=400, detail=f"Error parsing text: {str(e)}")
 
 
+async def _transcribe_upload(audio: UploadFile, language: Optional[str]) -> str:
+    """Stream an audio upload to a temporary file and transcribe it from there"""
+    fd, temp_path = tempfile.mkstemp(suffix=audio_file_suffix(audio.filename))
+    os.close(fd)
+    try:
+        size = await _stream_upload(audio, temp_path)
+        if not size:
+            raise HTTPException(status_code=400, detail="Empty audio file received")
+
+        print(f"Received audio file: {audio.filename or 'audio.webm'}, size: {size} bytes")
+        return await transcribe_audio_file_async(temp_path, language=language)
+    finally:
+        try:
+            await aiofiles.os.remove(temp_path)
+        except OSError as cleanup_error:
+            print(f"Warning: Could not delete temp file {temp_path}: {cleanup_error}")
+
+
 @router.post("/transcribe-audio")
 async def transcribe_audio_chunk(
     audio: UploadFile = File(...),
@@ -963,21 +1144,9 @@ async def transcribe_audio_chunk(
     """Transcribe an audio chunk using local Whisper model (no API key needed)
     Uses the open-source Whisper model running locally on the server.
     """
-    from ..services.speech_to_text import transcribe_audio_bytes
-    import traceback
-
     try:
-        # Read audio file content
-        audio_bytes = await audio.read()
-        filename = audio.filename or "audio.webm"
-
-        if len(audio_bytes) == 0:
-            raise HTTPException(status_code=400, detail="Empty audio file received")
-
-        print(f"Received audio file: {filename}, size: {len(audio_bytes)} bytes")
-
         # Transcribe audio using local Whisper model
-        transcription = transcribe_audio_bytes(audio_bytes, filename=filename, language=language)
+        transcription = await _transcribe_upload(audio, language)
 
         return {
             "transcription": transcription,
@@ -1011,20 +1180,16 @@ async def transcribe_audio_final(
     language: Optional[str] = Form(None)
 ):
     """Transcribe complete audio file and return full transcription"""
-    from ..services.speech_to_text import transcribe_audio_bytes
-
     try:
-        # Read audio file content
-        audio_bytes = await audio.read()
-        filename = audio.filename or "audio.webm"
-
         # Transcribe audio
-        transcription = transcribe_audio_bytes(audio_bytes, filename=filename, language=language)
+        transcription = await _transcribe_upload(audio, language)
 
         return {
             "transcription": transcription,
             "success": True
         }
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=400, detail=f"Error transcribing audio: {str(e)}")
 
@@ -1037,64 +1202,11 @@ async def receive_email_order(
     db: Session = Depends(get_db)
 ):
     """Simulate receiving an order via email with optional attachment"""
-    from ..services.order_parser import parse_document
-    import aiofiles
-    import os
-
-    parsed_data = None
-    file_path = None
-
     try:
-        # If there's an attachment, parse it
-        if attachment:
-            os.makedirs("uploads", exist_ok=True)
-            file_path = f"uploads/{attachment.filename}"
-
-            async with aiofiles.open(file_path, 'wb') as out_file:
-                content = await attachment.read()
-                await out_file.write(content)
-
-            parsed_data = await parse_document(file_path)
-
-            # Clean up uploaded file
-            if os.path.exists(file_path):
-                os.remove(file_path)
-                file_path = None
-        # Otherwise, parse email body text
-        elif email_body:
-            parsed_data = parse_order_from_text(email_body)
-        else:
-            raise HTTPException(status_code=400, detail="Either attachment or email_body must be provided")
-
-        # Create order from parsed data
-        order_data = OrderCreate(
-            order_number=parsed_data.get("order_number"),
-            delivery_address=parsed_data.get("delivery_address", ""),
-            customer_name=parsed_data.get("customer_name"),
-            customer_phone=parsed_data.get("customer_phone"),
-            customer_email=sender_email or parsed_data.get("customer_email"),
-            description=parsed_data.get("description"),
-            items=parsed_data.get("items"),
-            delivery_time_window_start=parsed_data.get("delivery_time_window_start"),
-            delivery_time_window_end=parsed_data.get("delivery_time_window_end"),
-            priority=None,  # Will be calculated automatically
-            source="email",
-            raw_text=parsed_data.get("raw_text") or email_body
-        )
-
-        db_order = prepare_order_for_db(order_data, db)
-        db.add(db_order)
-        db.commit()
-        db.refresh(db_order)
-
-        return db_order
-
+        return await _ingest_order("email", db, file=attachment, text_body=email_body, sender_email=sender_email)
     except HTTPException:
         raise
     except Exception as e:
-        # Clean up on error
-        if file_path and os.path.exists(file_path):
-            os.remove(file_path)
         raise HTTPException(status_code=400, detail=f"Error processing email order: {str(e)}")
 
 
@@ -1104,51 +1216,11 @@ async def receive_fax_order(
     db: Session = Depends(get_db)
 ):
     """Simulate receiving an order via fax"""
-    from ..services.order_parser import parse_document
-    import aiofiles
-    import os
-
-    os.makedirs("uploads", exist_ok=True)
-    file_path = f"uploads/{file.filename}"
-
-    async with aiofiles.open(file_path, 'wb') as out_file:
-        content = await file.read()
-        await out_file.write(content)
-
-    # Parse document
     try:
-        parsed_data = await parse_document(file_path)
-
-        # Create order from parsed data
-        order_data = OrderCreate(
-            order_number=parsed_data.get("order_number"),
-            delivery_address=parsed_data.get("delivery_address", ""),
-            customer_name=parsed_data.get("customer_name"),
-            customer_phone=parsed_data.get("customer_phone"),
-            customer_email=parsed_data.get("customer_email"),
-            description=parsed_data.get("description"),
-            items=parsed_data.get("items"),
-            delivery_time_window_start=parsed_data.get("delivery_time_window_start"),
-            delivery_time_window_end=parsed_data.get("delivery_time_window_end"),
-            priority=None,  # Will be calculated automatically
-            source="fax",
-            raw_text=parsed_data.get("raw_text")
-        )
-
-        db_order = prepare_order_for_db(order_data, db)
-        db.add(db_order)
-        db.commit()
-        db.refresh(db_order)
-
-        # Clean up uploaded file
-        os.remove(file_path)
-
-        return db_order
-
+        return await _ingest_order("fax", db, file=file)
+    except HTTPException:
+        raise
     except Exception as e:
-        # Clean up on error
-        if os.path.exists(file_path):
-            os.remove(file_path)
         raise HTTPException(status_code=400, detail=f"Error parsing fax document: {str(e)}")
 
 
@@ -1158,49 +1230,9 @@ async def receive_mail_order(
     db: Session = Depends(get_db)
 ):
     """Simulate receiving an order via scanned physical mail"""
-    from ..services.order_parser import parse_document
-    import aiofiles
-    import os
-
-    os.makedirs("uploads", exist_ok=True)
-    file_path = f"uploads/{file.filename}"
-
-    async with aiofiles.open(file_path, 'wb') as out_file:
-        content = await file.read()
-        await out_file.write(content)
-
-    # Parse document
     try:
-        parsed_data = await parse_document(file_path)
-
-        # Create order from parsed data
-        order_data = OrderCreate(
-            order_number=parsed_data.get("order_number"),
-            delivery_address=parsed_data.get("delivery_address", ""),
-            customer_name=parsed_data.get("customer_name"),
-            customer_phone=parsed_data.get("customer_phone"),
-            customer_email=parsed_data.get("customer_email"),
-            description=parsed_data.get("description"),
-            items=parsed_data.get("items"),
-            delivery_time_window_start=parsed_data.get("delivery_time_window_start"),
-            delivery_time_window_end=parsed_data.get("delivery_time_window_end"),
-            priority=None,  # Will be calculated automatically
-            source="mail",
-            raw_text=parsed_data.get("raw_text")
-        )
-
-        db_order = prepare_order_for_db(order_data, db)
-        db.add(db_order)
-        db.commit()
-        db.refresh(db_order)
-
-        # Clean up uploaded file
-        os.remove(file_path)
-
-        return db_order
-
+        return await _ingest_order("mail", db, file=file)
+    except HTTPException:
+        raise
     except Exception as e:
-        # Clean up on error
-        if os.path.exists(file_path):
-            os.remove(file_path)
         raise HTTPException(status_code=400, detail=f"Error parsing mail document: {str(e)}")
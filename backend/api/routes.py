@@ -1,28 +1,84 @@
 import json
+import logging
+import urllib.parse
 from datetime import datetime
 from typing import List, Optional
 
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from sqlalchemy import func
+from fastapi import APIRouter, Depends, HTTPException, Response
+from pydantic import TypeAdapter
+from sqlalchemy.orm import Session, defer, selectinload
+from sqlalchemy import exists, func, insert, select, update
 
-from ..database import get_db, Route, RouteOrder, Order, Driver, Depot, ParkingLocation
+from ..database import get_db, get_default_depot, Route, RouteOrder, Order, Driver, ParkingLocation, delete_routes
 from ..models import (
     RouteCreate, RouteUpdate, Route as RouteModel,
     RouteOrderItem, RouteWithOrders, OrderCreate, PlanRoutesRequest
 )
-from ..services.route_optimizer import optimize_route, calculate_route_improvement
-from ..services.route_calculator import calculate_complete_route
+from ..services.route_optimizer import optimize_route, optimize_route_2opt, calculate_route_improvement
+from ..services.route_calculator import calculate_complete_route, calculate_distance
+from ..services.osrm_client import get_route_distance_and_time, check_osrm_available
 from ..services.ai_agents import suggest_route_optimization
 from ..services.route_clustering import cluster_orders
 from ..services.driver_assigner import assign_drivers_to_clusters, calculate_route_statistics
-from .orders import prepare_order_for_db
+from ..services.json_response import json_response
+from .orders import insert_order, prepare_order_for_db
 
 router = APIRouter(prefix="/api/routes", tags=["routes"])
 
 PARKING_BBOX_PADDING_DEGREES = 0.03  # ~3 km latitude/longitude padding
 PARKING_LIMIT_PER_ROUTE = 4000
 
+ROUTE_LIST_ADAPTER = TypeAdapter(List[RouteModel])
+
+# Route stops load their orders in one IN query, minus the OCR/raw text and
+# validation blobs that no route endpoint reads
+ROUTE_ORDER_WITH_ORDER = selectinload(RouteOrder.order).options(
+    defer(Order.raw_text),
+    defer(Order.validation_errors),
+)
+
+# Stop and order fields returned in RouteWithOrders.route_orders
+ROUTE_ORDER_RESPONSE_FIELDS = ("id", "order_id", "sequence", "status", "estimated_arrival", "actual_arrival")
+ORDER_RESPONSE_FIELDS = (
+    "id",
+    "order_number",
+    "customer_name",
+    "customer_phone",
+    "customer_email",
+    "delivery_address",
+    "description",
+    "latitude",
+    "longitude",
+    "items",
+    "delivery_time_window_start",
+    "delivery_time_window_end",
+    "priority",
+    "status",
+    "driver_status",
+    "assigned_driver_id",
+    "driver_notes",
+    "failure_reason",
+    "driver_status_updated_at",
+    "driver_gps_lat",
+    "driver_gps_lng",
+    "delivered_at",
+    "failed_at",
+    "proof_photo_path",
+    "proof_signature_path",
+    "proof_metadata",
+    "proof_captured_at",
+    "source",
+    "created_at",
+    "updated_at",
+)
+
+# get_route's stop rows: the RouteOrder columns followed by the Order columns,
+# in the order of the field tuples above
+ROUTE_STOP_ROWS = select(
+    *(getattr(RouteOrder, field) for field in ROUTE_ORDER_RESPONSE_FIELDS),
+    *(getattr(Order, field) for field in ORDER_RESPONSE_FIELDS),
+).outerjoin(Order, Order.id == RouteOrder.order_id)
+
 
 def _extract_source_from_notes(notes: Optional[str]) -> Optional[str]:
     if not notes:
@@ -95,27 +151,30 @@ def _load_relevant_parking_locations(
     return parking_data
 
 
+def _driver_exists(db: Session, driver_id: int) -> bool:
+    """Existence check that doesn't load the Driver row"""
+    return db.query(exists().where(Driver.id == driver_id)).scalar()
+
+
 @router.post("/", response_model=RouteWithOrders)
 def create_route(route: RouteCreate, db: Session = Depends(get_db)):
     """Create a new route"""
     # Verify driver exists
-    driver = db.query(Driver).filter(Driver.id == route.driver_id).first()
-    if not driver:
+    if not route.driver_id or not _driver_exists(db, route.driver_id):
         raise HTTPException(status_code=404, detail="Driver not found")
 
     # Create route without order_ids
-    route_data = route.dict()
+    route_data = route.model_dump()
     order_ids = route_data.pop('order_ids', None)
     db_route = Route(**route_data)
     db.add(db_route)
     db.commit()
-    db.refresh(db_route)
 
     # Add orders if provided
     if order_ids:
         for sequence, order_id in enumerate(order_ids, 1):
             # Verify order exists
-            order = db.query(Order).filter(Order.id == order_id).first()
+            order = db.get(Order, order_id)
             if not order:
                 raise HTTPException(status_code=404, detail=f"Order {order_id} not found")
 
@@ -136,7 +195,7 @@ def create_route(route: RouteCreate, db: Session = Depends(get_db)):
         db_route.updated_at = datetime.utcnow()
         db.commit()
 
-    return get_route(db_route.id, db)
+    return json_response(_load_route_with_orders_dict(db, db_route))
 
 
 @router.get("/", response_model=List[RouteModel])
@@ -148,8 +207,15 @@ def get_routes(
     db: Session = Depends(get_db)
 ):
     """Get all routes with optional filters, including order counts"""
+    # Plain columns: the rows go straight into dicts, no Route entities needed
     query = db.query(
-        Route,
+        Route.id,
+        Route.driver_id,
+        Route.name,
+        Route.date,
+        Route.status,
+        Route.created_at,
+        Route.updated_at,
         func.count(RouteOrder.id).label('order_count')
     ).outerjoin(RouteOrder, Route.id == RouteOrder.route_id)
 
@@ -160,37 +226,16 @@ def get_routes(
 
     query = query.group_by(Route.id).offset(skip).limit(limit)
 
-    # Convert to list of route dicts with order counts
-    results = query.all()
-    routes = []
-    for route, order_count in results:
-        route_dict = {
-            "id": route.id,
-            "driver_id": route.driver_id,
-            "name": route.name,
-            "date": route.date,
-            "status": route.status,
-            "created_at": route.created_at,
-            "updated_at": route.updated_at,
-            "order_count": order_count or 0
-        }
-        routes.append(route_dict)
-
-    return routes
-
-
-@router.get("/{route_id}", response_model=RouteWithOrders)
-def get_route(route_id: int, db: Session = Depends(get_db)):
-    """Get a specific route with its orders"""
-    route = db.query(Route).filter(Route.id == route_id).first()
-    if not route:
-        raise HTTPException(status_code=404, detail="Route not found")
+    # Rows come straight from typed columns; build the models without
+    # validation and serialize once instead of letting the response_model
+    # validate every route again
+    routes = [RouteModel.model_construct(**row._asdict()) for row in query.all()]
+    return Response(content=ROUTE_LIST_ADAPTER.dump_json(routes), media_type="application/json")
 
-    route_orders = db.query(RouteOrder).filter(RouteOrder.route_id == route_id)\
-        .order_by(RouteOrder.sequence).all()
 
-    # Convert route to dict, excluding SQLAlchemy internal attributes
-    route_dict = {
+def _route_dict(route: Route) -> dict:
+    """Route columns for RouteWithOrders, with an empty stop list to fill in"""
+    return {
         "id": route.id,
         "driver_id": route.driver_id,
         "name": route.name,
@@ -201,85 +246,71 @@ def get_route(route_id: int, db: Session = Depends(get_db)):
         "route_orders": []
     }
 
-    # Convert route orders and orders to serializable dicts
+
+def _route_with_orders_dict(route: Route, route_orders: List[RouteOrder]) -> dict:
+    """Serialize a route and its (sequence-ordered) route orders for RouteWithOrders"""
+    route_dict = _route_dict(route)
     for ro in route_orders:
-        order = db.query(Order).filter(Order.id == ro.order_id).first() if ro.order_id else None
-
-        route_order_dict = {
-            "id": ro.id,
-            "order_id": ro.order_id,
-            "sequence": ro.sequence,
-            "status": ro.status,
-            "estimated_arrival": ro.estimated_arrival,
-            "actual_arrival": ro.actual_arrival,
-        }
+        route_order_dict = {field: getattr(ro, field) for field in ROUTE_ORDER_RESPONSE_FIELDS}
+        order = ro.order
+        route_order_dict["order"] = (
+            {field: getattr(order, field) for field in ORDER_RESPONSE_FIELDS} if order else None
+        )
+        route_dict["route_orders"].append(route_order_dict)
+    return route_dict
 
-        # Add order data if available
-        if order:
-            route_order_dict["order"] = {
-                "id": order.id,
-                "order_number": order.order_number,
-                "customer_name": order.customer_name,
-                "customer_phone": order.customer_phone,
-                "customer_email": order.customer_email,
-                "delivery_address": order.delivery_address,
-                "description": order.description,
-                "latitude": order.latitude,
-                "longitude": order.longitude,
-                "items": order.items,
-                "delivery_time_window_start": order.delivery_time_window_start,
-                "delivery_time_window_end": order.delivery_time_window_end,
-                "priority": order.priority,
-                "status": order.status,
-                "driver_status": order.driver_status,
-                "assigned_driver_id": order.assigned_driver_id,
-                "driver_notes": order.driver_notes,
-                "failure_reason": order.failure_reason,
-                "driver_status_updated_at": order.driver_status_updated_at,
-                "driver_gps_lat": order.driver_gps_lat,
-                "driver_gps_lng": order.driver_gps_lng,
-                "delivered_at": order.delivered_at,
-                "failed_at": order.failed_at,
-                "proof_photo_path": order.proof_photo_path,
-                "proof_signature_path": order.proof_signature_path,
-                "proof_metadata": order.proof_metadata,
-                "proof_captured_at": order.proof_captured_at,
-                "source": order.source,
-                "created_at": order.created_at,
-                "updated_at": order.updated_at
-            }
-        else:
-            route_order_dict["order"] = None
 
+def _load_route_with_orders_dict(db: Session, route: Route) -> dict:
+    """Read a route's stops and orders and serialize them for RouteWithOrders"""
+    # Stops and their orders as plain rows from one join: no ORM objects to
+    # build, and each row splits positionally into the two dicts
+    rows = db.execute(
+        ROUTE_STOP_ROWS.where(RouteOrder.route_id == route.id).order_by(RouteOrder.sequence)
+    )
+    route_dict = _route_dict(route)
+    split = len(ROUTE_ORDER_RESPONSE_FIELDS)
+    for row in rows:
+        route_order_dict = dict(zip(ROUTE_ORDER_RESPONSE_FIELDS, row[:split]))
+        # The outer join leaves the order columns NULL when the order is gone
+        route_order_dict["order"] = (
+            dict(zip(ORDER_RESPONSE_FIELDS, row[split:])) if row[split] is not None else None
+        )
         route_dict["route_orders"].append(route_order_dict)
 
     return route_dict
 
 
+@router.get("/{route_id}", response_model=RouteWithOrders)
+def get_route(route_id: int, db: Session = Depends(get_db)):
+    """Get a specific route with its orders"""
+    route = db.get(Route, route_id)
+    if not route:
+        raise HTTPException(status_code=404, detail="Route not found")
+
+    return json_response(_load_route_with_orders_dict(db, route))
+
+
 @router.put("/{route_id}", response_model=RouteModel)
 def update_route(route_id: int, route_update: RouteUpdate, db: Session = Depends(get_db)):
     """Update a route"""
-    db_route = db.query(Route).filter(Route.id == route_id).first()
+    db_route = db.get(Route, route_id)
     if not db_route:
         raise HTTPException(status_code=404, detail="Route not found")
 
-    update_data = route_update.dict(exclude_unset=True)
+    update_data = route_update.model_dump(exclude_unset=True)
     previous_driver_id = db_route.driver_id
     new_driver_id = update_data.get("driver_id")
 
     # Verify driver exists if updating driver_id
-    if new_driver_id is not None:
-        driver = db.query(Driver).filter(Driver.id == new_driver_id).first()
-        if not driver:
-            raise HTTPException(status_code=404, detail="Driver not found")
+    if new_driver_id is not None and not _driver_exists(db, new_driver_id):
+        raise HTTPException(status_code=404, detail="Driver not found")
 
     for field, value in update_data.items():
         setattr(db_route, field, value)
 
-    db_route.updated_at = datetime.utcnow()
-
     if new_driver_id is not None and new_driver_id != previous_driver_id:
-        route_orders = db.query(RouteOrder).filter(RouteOrder.route_id == route_id).all()
+        route_orders = db.query(RouteOrder).options(ROUTE_ORDER_WITH_ORDER)\
+            .filter(RouteOrder.route_id == route_id).all()
         for route_order in route_orders:
             if route_order.order:
                 route_order.order.assigned_driver_id = new_driver_id
@@ -287,18 +318,17 @@ def update_route(route_id: int, route_update: RouteUpdate, db: Session = Depends
                 route_order.order.driver_status_updated_at = datetime.utcnow()
 
     db.commit()
-    db.refresh(db_route)
     return db_route
 
 
 @router.delete("/{route_id}")
 def delete_route(route_id: int, db: Session = Depends(get_db)):
     """Delete a route"""
-    db_route = db.query(Route).filter(Route.id == route_id).first()
-    if not db_route:
+    deleted = delete_routes(db, Route.id == route_id)
+    if not deleted:
+        db.rollback()
         raise HTTPException(status_code=404, detail="Route not found")
 
-    db.delete(db_route)
     db.commit()
     return {"message": "Route deleted successfully"}
 
@@ -310,37 +340,41 @@ def add_orders_to_route(
     db: Session = Depends(get_db)
 ):
     """Add orders to a route"""
-    route = db.query(Route).filter(Route.id == route_id).first()
+    route = db.get(Route, route_id)
     if not route:
         raise HTTPException(status_code=404, detail="Route not found")
 
-    # Clear existing route orders
-    db.query(RouteOrder).filter(RouteOrder.route_id == route_id).delete()
+    # Verify all orders exist with one query
+    order_ids = [item.order_id for item in order_items]
+    orders_by_id = {o.id: o for o in db.query(Order).filter(Order.id.in_(order_ids))}
+    for order_id in order_ids:
+        if order_id not in orders_by_id:
+            raise HTTPException(status_code=404, detail=f"Order {order_id} not found")
 
-    # Add new route orders
-    for item in order_items:
-        # Verify order exists
-        order = db.query(Order).filter(Order.id == item.order_id).first()
-        if not order:
-            raise HTTPException(status_code=404, detail=f"Order {item.order_id} not found")
+    # Clear existing route orders
+    db.query(RouteOrder).filter(RouteOrder.route_id == route_id).delete(synchronize_session=False)
 
+    now = datetime.utcnow()
+    for order in orders_by_id.values():
         order.assigned_driver_id = route.driver_id
         order.driver_status = order.driver_status or "assigned"
-        order.driver_status_updated_at = datetime.utcnow()
+        order.driver_status_updated_at = now
         order.status = "assigned"
 
-        route_order = RouteOrder(
-            route_id=route_id,
-            order_id=item.order_id,
-            sequence=item.sequence
-        )
-        db.add(route_order)
+    # Add new route orders in a single INSERT; RETURNING hands back the rows
+    # (ids, defaults) so the response needs no reload
+    route_orders = []
+    if order_items:
+        route_orders = db.scalars(insert(RouteOrder).returning(RouteOrder), [
+            {"route_id": route_id, "order_id": item.order_id, "sequence": item.sequence}
+            for item in order_items
+        ]).all()
 
-    route.updated_at = datetime.utcnow()
+    route.updated_at = now
     db.commit()
 
-    # Return updated route
-    return get_route(route_id, db)
+    # The orders are in the identity map already, so ro.order needs no query
+    return json_response(_route_with_orders_dict(route, sorted(route_orders, key=lambda ro: ro.sequence)))
 
 
 @router.post("/{route_id}/optimize")
@@ -349,22 +383,23 @@ def optimize_route_orders(
     db: Session = Depends(get_db)
 ):
     """Optimize the order sequence in a route considering depots, parking spots, and deliveries"""
-    route = db.query(Route).filter(Route.id == route_id).first()
+    route = db.get(Route, route_id)
     if not route:
         raise HTTPException(status_code=404, detail="Route not found")
 
     # Get route orders
-    route_orders = db.query(RouteOrder).filter(RouteOrder.route_id == route_id)\
+    route_orders = db.query(RouteOrder).options(ROUTE_ORDER_WITH_ORDER)\
+        .filter(RouteOrder.route_id == route_id)\
         .order_by(RouteOrder.sequence).all()
 
     if not route_orders:
         raise HTTPException(status_code=400, detail="Route has no orders to optimize")
 
     # Get depot (use first depot or driver's current location)
-    depot = db.query(Depot).first()
+    depot = get_default_depot(db)
     if not depot:
         # Use driver's current location or default
-        driver = db.query(Driver).filter(Driver.id == route.driver_id).first()
+        driver = db.get(Driver, route.driver_id) if route.driver_id else None
         if driver and driver.current_location_lat and driver.current_location_lng:
             depot_dict = {
                 "id": None,
@@ -392,9 +427,11 @@ def optimize_route_orders(
 
     # Get order locations first (needed for parking data loading)
     orders_data = []
+    route_order_ids = []  # RouteOrder id per orders_data entry
     for ro in route_orders:
-        order = db.query(Order).filter(Order.id == ro.order_id).first()
+        order = ro.order
         if order and order.latitude and order.longitude:
+            route_order_ids.append(ro.id)
             orders_data.append({
                 "id": order.id,
                 "order_number": order.order_number,
@@ -410,7 +447,7 @@ def optimize_route_orders(
     if not orders_data:
         missing_orders = []
         for ro in route_orders:
-            order = db.query(Order).filter(Order.id == ro.order_id).first()
+            order = ro.order
             if not order:
                 missing_orders.append(f"Order ID {ro.order_id} not found")
             elif not order.latitude or not order.longitude:
@@ -450,10 +487,12 @@ def optimize_route_orders(
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error calculating route: {str(e)}")
 
-    # Update route order sequences
-    for new_seq, orig_idx in enumerate(optimized_indices, start=1):
-        route_order = route_orders[orig_idx]
-        route_order.sequence = new_seq
+    # Update route order sequences in one executemany UPDATE (by primary key).
+    # optimized_indices index orders_data, which skips stops without coordinates
+    db.execute(update(RouteOrder), [
+        {"id": route_order_ids[orig_idx], "sequence": new_seq}
+        for new_seq, orig_idx in enumerate(optimized_indices, start=1)
+    ])
 
     route.updated_at = datetime.utcnow()
     db.commit()
@@ -464,7 +503,7 @@ def optimize_route_orders(
         original_order, optimized_indices, depot_dict, orders_data
     )
 
-    return {
+    return json_response({
         "message": "Route optimized successfully",
         "optimized_order_ids": [orders_data[idx]["id"] for idx in optimized_indices],
         "optimization_metrics": improvement_metrics,
@@ -474,7 +513,7 @@ def optimize_route_orders(
             "waypoint_count": len(complete_route["waypoints"])
         },
         "waypoints": complete_route["waypoints"]
-    }
+    })
 
 
 @router.delete("/{route_id}/orders/{order_id}")
@@ -484,27 +523,22 @@ def remove_order_from_route(
     db: Session = Depends(get_db)
 ):
     """Remove an order from a route"""
-    route_order = db.query(RouteOrder).filter(
+    deleted = db.query(RouteOrder).filter(
         RouteOrder.route_id == route_id,
         RouteOrder.order_id == order_id
-    ).first()
+    ).delete(synchronize_session=False)
 
-    if not route_order:
+    if not deleted:
+        db.rollback()
         raise HTTPException(status_code=404, detail="Order not found in route")
 
-    order = db.query(Order).filter(Order.id == order_id).first()
-    db.delete(route_order)
-
-    if order:
-        remaining_assignment = (
-            db.query(RouteOrder)
-            .filter(RouteOrder.order_id == order_id)
-            .count()
-        )
-        if remaining_assignment == 0:
-            order.assigned_driver_id = None
-            order.driver_status = "unassigned"
-            order.driver_status_updated_at = datetime.utcnow()
+    # Unassign the order unless it is still on another route
+    db.execute(
+        update(Order)
+        .where(Order.id == order_id, ~exists().where(RouteOrder.order_id == order_id))
+        .values(assigned_driver_id=None, driver_status="unassigned", driver_status_updated_at=datetime.utcnow())
+        .execution_options(synchronize_session=False)
+    )
 
     db.commit()
     return {"message": "Order removed from route successfully"}
@@ -521,20 +555,19 @@ def create_order_and_add_to_route(
     Handles geocoding if coordinates are not provided.
     """
     # Verify route exists
-    route = db.query(Route).filter(Route.id == route_id).first()
+    route = db.get(Route, route_id)
     if not route:
         raise HTTPException(status_code=404, detail="Route not found")
 
     db_order = prepare_order_for_db(order, db)
-    db.add(db_order)
-    db.flush()  # Flush to get the order ID
+    insert_order(db, db_order)  # Flushes, so the order ID is available
 
     # Get current max sequence number for this route
-    max_sequence = db.query(RouteOrder).filter(
+    max_sequence = db.query(func.max(RouteOrder.sequence)).filter(
         RouteOrder.route_id == route_id
-    ).order_by(RouteOrder.sequence.desc()).first()
+    ).scalar()
 
-    next_sequence = (max_sequence.sequence + 1) if max_sequence else 1
+    next_sequence = (max_sequence or 0) + 1
 
     # Add order to route
     route_order = RouteOrder(
@@ -552,8 +585,7 @@ def create_order_and_add_to_route(
     route.updated_at = datetime.utcnow()
     db.commit()
 
-    # Return updated route
-    return get_route(route_id, db)
+    return json_response(_load_route_with_orders_dict(db, route))
 
 
 @router.get("/{route_id}/visualize")
@@ -565,21 +597,22 @@ def get_route_visualization(
     Get route data formatted for map visualization
     Returns route with waypoints, segments, and color coding
     """
-    route = db.query(Route).filter(Route.id == route_id).first()
+    route = db.get(Route, route_id)
     if not route:
         raise HTTPException(status_code=404, detail="Route not found")
 
     # Get route orders
-    route_orders = db.query(RouteOrder).filter(RouteOrder.route_id == route_id)\
+    route_orders = db.query(RouteOrder).options(ROUTE_ORDER_WITH_ORDER)\
+        .filter(RouteOrder.route_id == route_id)\
         .order_by(RouteOrder.sequence).all()
 
     if not route_orders:
         raise HTTPException(status_code=400, detail="Route has no orders")
 
     # Get depot
-    depot = db.query(Depot).first()
+    depot = get_default_depot(db)
     if not depot:
-        driver = db.query(Driver).filter(Driver.id == route.driver_id).first()
+        driver = db.get(Driver, route.driver_id) if route.driver_id else None
         if driver and driver.current_location_lat and driver.current_location_lng:
             depot_dict = {
                 "id": None,
@@ -608,7 +641,7 @@ def get_route_visualization(
     # Get order locations first (needed for parking data loading)
     orders_data = []
     for ro in route_orders:
-        order = db.query(Order).filter(Order.id == ro.order_id).first()
+        order = ro.order
         if order and order.latitude and order.longitude:
             orders_data.append({
                 "id": order.id,
@@ -626,7 +659,7 @@ def get_route_visualization(
     if not orders_data:
         missing_orders = []
         for ro in route_orders:
-            order = db.query(Order).filter(Order.id == ro.order_id).first()
+            order = ro.order
             if not order:
                 missing_orders.append(f"Order ID {ro.order_id} not found")
             elif not order.latitude or not order.longitude:
@@ -728,7 +761,7 @@ def get_route_visualization(
     if complete_route.get("geometry"):
         result["geometry"] = complete_route["geometry"]  # GeoJSON LineString
 
-    return result
+    return json_response(result)
 
 
 @router.get("/driver/{driver_id}/google-maps-url")
@@ -740,8 +773,6 @@ def get_google_maps_url_for_driver(
     Generate a Google Maps URL with all waypoints (depot, deliveries, parking) for a driver's active route.
     Returns a URL that opens Google Maps with the full itinerary.
     """
-    import urllib.parse
-
     # Get the driver's active route
     route = db.query(Route).filter(
         Route.driver_id == driver_id,
@@ -756,16 +787,17 @@ def get_google_maps_url_for_driver(
         raise HTTPException(status_code=404, detail="No route found for this driver")
 
     # Get route orders
-    route_orders = db.query(RouteOrder).filter(RouteOrder.route_id == route.id)\
+    route_orders = db.query(RouteOrder).options(ROUTE_ORDER_WITH_ORDER)\
+        .filter(RouteOrder.route_id == route.id)\
         .order_by(RouteOrder.sequence).all()
 
     if not route_orders:
         raise HTTPException(status_code=400, detail="Route has no orders")
 
     # Get depot
-    depot = db.query(Depot).first()
+    depot = get_default_depot(db)
     if not depot:
-        driver = db.query(Driver).filter(Driver.id == driver_id).first()
+        driver = db.get(Driver, driver_id)
         if driver and driver.current_location_lat and driver.current_location_lng:
             depot_dict = {
                 "id": None,
@@ -795,7 +827,7 @@ def get_google_maps_url_for_driver(
     # Get order locations with addresses
     orders_data = []
     for ro in route_orders:
-        order = db.query(Order).filter(Order.id == ro.order_id).first()
+        order = ro.order
         if order and order.latitude and order.longitude:
             orders_data.append({
                 "id": order.id,
@@ -886,10 +918,6 @@ def plan_routes(
     5. Move to next driver for the next batch
     6. Update order status to 'assigned' and driver status to 'on_route'
     """
-    import logging
-    from ..services.route_calculator import calculate_distance
-    from ..services.osrm_client import get_route_distance_and_time, check_osrm_available
-
     logger = logging.getLogger(__name__)
 
     # Get pending orders
@@ -924,7 +952,7 @@ def plan_routes(
         }
 
     # Get depot
-    depot = db.query(Depot).first()
+    depot = get_default_depot(db)
     if not depot:
         raise HTTPException(status_code=400, detail="No depot configured")
 
@@ -1068,8 +1096,8 @@ def plan_routes(
         # Create route with these orders
         if current_route_orders:
             # Get order objects
-            route_orders_db = [db.query(Order).filter(Order.id == oid).first() for oid in current_route_orders]
-            route_orders_db = [o for o in route_orders_db if o]
+            orders_by_id = {o.id: o for o in db.query(Order).filter(Order.id.in_(current_route_orders))}
+            route_orders_db = [orders_by_id[oid] for oid in current_route_orders if oid in orders_by_id]
 
             if route_orders_db:
                 # Convert to dict format for optimization
@@ -1092,7 +1120,6 @@ def plan_routes(
 
                 # Optimize route order using 2-opt
                 try:
-                    from ..services.route_optimizer import optimize_route_2opt
                     optimized_order_indices = optimize_route_2opt(
                         depot_dict,
                         orders_for_opt,
@@ -1108,9 +1135,7 @@ def plan_routes(
                 db_route = Route(
                     name=f"Route {route_index + 1}",
                     driver_id=driver.id,
-                    status="planned",
-                    created_at=datetime.utcnow(),
-                    updated_at=datetime.utcnow()
+                    status="planned"
                 )
                 db.add(db_route)
                 db.flush()
@@ -1134,13 +1159,11 @@ def plan_routes(
                     # Update order status to assigned
                     order.status = "assigned"
                     order.assigned_driver_id = driver.id
-                    order.updated_at = datetime.utcnow()
 
                 # Update driver status to on_route
                 driver.status = "on_route"
 
                 db.commit()
-                db.refresh(db_route)
 
                 # Get route with orders for response
                 created_routes.append({
@@ -1160,7 +1183,7 @@ def plan_routes(
     total_orders_assigned = sum(len(r["order_ids"]) for r in created_routes)
     total_orders = len(pending_orders)
 
-    return {
+    return json_response({
         "routes": created_routes,
         "statistics": {
             "total_routes": len(created_routes),
@@ -1173,4 +1196,4 @@ def plan_routes(
             "average_orders_per_route": round(total_orders_assigned / len(created_routes), 1) if created_routes else 0,
             "average_distance_per_route": 0
         }
-    }
+    })
@@ -1,17 +1,95 @@
-from sqlalchemy import create_engine, Column, Integer, String, Float, DateTime, Boolean, ForeignKey, Text, JSON
+import os
+import time
+from typing import List, NamedTuple, Optional
+
+from sqlalchemy import create_engine, event, func, insert, inspect, select, text, update, Index, Column, Integer, SmallInteger, String, Float, DateTime, Boolean, ForeignKey, Text, JSON
+from sqlalchemy.exc import CompileError
+from sqlalchemy.ext.compiler import compiles
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker, relationship
-from datetime import datetime
+from sqlalchemy.orm import Session, sessionmaker, relationship, validates
+from sqlalchemy.sql.elements import TextClause
+from sqlalchemy.sql.functions import FunctionElement
+from datetime import datetime, timezone
+
+SQLALCHEMY_DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./route_planning.db")
 
-SQLALCHEMY_DATABASE_URL = "sqlite:///./route_planning.db"
+# Sync endpoints each hold a pooled connection, so size the pool for the
+# threadpool concurrency instead of SQLAlchemy's default of 5 + 10 overflow
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", str(max(20, 2 * (os.cpu_count() or 1)))))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "40"))
+DB_POOL_TIMEOUT = int(os.getenv("DB_POOL_TIMEOUT", "10"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "300"))
 
 engine = create_engine(
-    SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False}
+    SQLALCHEMY_DATABASE_URL,
+    connect_args={"check_same_thread": False} if SQLALCHEMY_DATABASE_URL.startswith("sqlite") else {},
+    pool_size=DB_POOL_SIZE,
+    max_overflow=DB_MAX_OVERFLOW,
+    pool_timeout=DB_POOL_TIMEOUT,
+    pool_recycle=DB_POOL_RECYCLE,
+    pool_pre_ping=True,
 )
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+# Instances keep their flushed state after commit (all defaults are set in
+# Python), so handlers can return them without a refresh() SELECT
+SessionLocal = sessionmaker(autocommit=False, autoflush=False, expire_on_commit=False, bind=engine)
 
 Base = declarative_base()
 
+# Sort rank stored next to Order.priority so listings can order by an index
+PRIORITY_RANKS = {"urgent": 1, "high": 2, "normal": 3, "low": 4}
+UNKNOWN_PRIORITY_RANK = 5
+
+
+def priority_rank_for(priority) -> int:
+    return PRIORITY_RANKS.get(priority, UNKNOWN_PRIORITY_RANK)
+
+
+class utc_timestamp(FunctionElement):
+    """
+    Server default for timestamp columns. SQLite's CURRENT_TIMESTAMP has no
+    fractional seconds while SQLAlchemy stores DateTime as
+    'YYYY-MM-DD HH:MM:SS.ffffff'; the values are compared as strings, so rows
+    written outside the ORM must use the same format there.
+    """
+    type = DateTime()
+    inherit_cache = True
+
+
+@compiles(utc_timestamp)
+def _compile_utc_timestamp(element, compiler, **kw):
+    return "CURRENT_TIMESTAMP"
+
+
+@compiles(utc_timestamp, "sqlite")
+def _compile_utc_timestamp_sqlite(element, compiler, **kw):
+    # %f is SS.SSS; pad to the six fractional digits SQLAlchemy writes
+    return "strftime('%Y-%m-%d %H:%M:%f000', 'now')"
+
+
+class json_type(FunctionElement):
+    """
+    Type name of a JSON value ('array', 'object', 'null', ...), for guarding
+    calls such as json_array_length that fail on other types. Supported on
+    SQLite (json_type) and PostgreSQL (json_typeof).
+    """
+    type = String()
+    inherit_cache = True
+
+
+@compiles(json_type)
+def _compile_json_type(element, compiler, **kw):
+    raise CompileError(f"json_type() is only supported on SQLite and PostgreSQL, not {compiler.dialect.name}")
+
+
+@compiles(json_type, "sqlite")
+def _compile_json_type_sqlite(element, compiler, **kw):
+    return f"json_type({compiler.process(element.clauses, **kw)})"
+
+
+@compiles(json_type, "postgresql")
+def _compile_json_type_postgresql(element, compiler, **kw):
+    return f"json_typeof({compiler.process(element.clauses, **kw)})"
+
 
 class Driver(Base):
     __tablename__ = "drivers"
@@ -20,7 +98,7 @@ class Driver(Base):
     name = Column(String, nullable=False)
     phone = Column(String)
     email = Column(String)
-    status = Column(String, default="available")  # available, on_route, offline
+    status = Column(String, default="available", index=True)  # available, on_route, offline
     access_code = Column(String, unique=True, index=True)  # simple driver auth token
     current_location_lat = Column(Float)
     current_location_lng = Column(Float)
@@ -69,6 +147,9 @@ class Order(Base):
     delivery_time_window_start = Column(DateTime)
     delivery_time_window_end = Column(DateTime)
     priority = Column(String, default="normal")  # low, normal, high, urgent
+    priority_rank = Column(
+        SmallInteger, nullable=False, default=PRIORITY_RANKS["normal"], server_default=text(str(UNKNOWN_PRIORITY_RANK))
+    )  # kept in sync with priority, see _sync_priority_rank
     status = Column(String, default="pending")  # pending, assigned, in_transit, completed, failed
     driver_status = Column(String, default="unassigned")  # unassigned, accepted, en_route, delivered, failed
     failure_reason = Column(Text)
@@ -77,7 +158,7 @@ class Order(Base):
     source = Column(String)  # email, fax, mail, phone
     raw_text = Column(Text)  # Original scanned/parsed text
     validation_errors = Column(JSON)  # List of validation errors
-    assigned_driver_id = Column(Integer, ForeignKey("drivers.id"))
+    assigned_driver_id = Column(Integer, ForeignKey("drivers.id", ondelete="SET NULL"))
     driver_gps_lat = Column(Float)
     driver_gps_lng = Column(Float)
     delivered_at = Column(DateTime)
@@ -86,34 +167,51 @@ class Order(Base):
     proof_signature_path = Column(String)
     proof_metadata = Column(JSON)
     proof_captured_at = Column(DateTime)
-    created_at = Column(DateTime, default=datetime.utcnow)
-    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    created_at = Column(DateTime, default=datetime.utcnow, server_default=utc_timestamp())
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, server_default=utc_timestamp())
 
     route_orders = relationship("RouteOrder", back_populates="order")
     assigned_driver = relationship("Driver", foreign_keys=[assigned_driver_id])
 
+    __table_args__ = (
+        # Match the filters and sort used by the order listing
+        Index("ix_orders_status_source", "status", "source"),
+        Index("ix_orders_created_at", created_at.desc()),
+        Index("ix_orders_rank_created", priority_rank, created_at.desc()),
+    )
+
+    @validates("priority")
+    def _sync_priority_rank(self, key, value):
+        self.priority_rank = priority_rank_for(value)
+        return value
+
 
 class Route(Base):
     __tablename__ = "routes"
 
     id = Column(Integer, primary_key=True, index=True)
-    driver_id = Column(Integer, ForeignKey("drivers.id"))
+    driver_id = Column(Integer, ForeignKey("drivers.id", ondelete="CASCADE"))
     name = Column(String)
     date = Column(DateTime, default=datetime.utcnow)
     status = Column(String, default="planned")  # planned, active, completed, cancelled
-    created_at = Column(DateTime, default=datetime.utcnow)
-    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    created_at = Column(DateTime, default=datetime.utcnow, server_default=utc_timestamp())
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, server_default=utc_timestamp())
 
     driver = relationship("Driver", back_populates="routes")
     route_orders = relationship("RouteOrder", back_populates="route", cascade="all, delete-orphan")
 
+    __table_args__ = (
+        # Driver feed: a driver's routes filtered by status
+        Index("ix_routes_driver_status", "driver_id", "status"),
+    )
+
 
 class RouteOrder(Base):
     __tablename__ = "route_orders"
 
     id = Column(Integer, primary_key=True, index=True)
-    route_id = Column(Integer, ForeignKey("routes.id"), nullable=False)
-    order_id = Column(Integer, ForeignKey("orders.id"), nullable=False)
+    route_id = Column(Integer, ForeignKey("routes.id", ondelete="CASCADE"), nullable=False)
+    order_id = Column(Integer, ForeignKey("orders.id", ondelete="CASCADE"), nullable=False)
     sequence = Column(Integer, nullable=False)  # Order in the route
     estimated_arrival = Column(DateTime)
     actual_arrival = Column(DateTime)
@@ -123,12 +221,18 @@ class RouteOrder(Base):
     route = relationship("Route", back_populates="route_orders")
     order = relationship("Order", back_populates="route_orders")
 
+    __table_args__ = (
+        # Stops of a route in sequence, and the routes an order is on
+        Index("ix_route_orders_route_seq", "route_id", "sequence"),
+        Index("ix_route_orders_order_id", "order_id"),
+    )
+
 
 class RouteWaypoint(Base):
     __tablename__ = "route_waypoints"
 
     id = Column(Integer, primary_key=True, index=True)
-    route_id = Column(Integer, ForeignKey("routes.id"), nullable=False)
+    route_id = Column(Integer, ForeignKey("routes.id", ondelete="CASCADE"), nullable=False)
     sequence = Column(Integer, nullable=False)  # Order in the route
     waypoint_type = Column(String, nullable=False)  # depot, parking, delivery
     latitude = Column(Float, nullable=False)
@@ -143,20 +247,242 @@ class RouteWaypoint(Base):
     route = relationship("Route")
 
 
+class OrderCounter(Base):
+    """Last order sequence number handed out per day (ddmmyy)"""
+    __tablename__ = "order_counters"
+
+    date_str = Column(String, primary_key=True)
+    counter = Column(Integer, nullable=False, default=0)
+
+
 class DriverUpdate(Base):
     __tablename__ = "driver_updates"
 
     id = Column(Integer, primary_key=True, index=True)
-    driver_id = Column(Integer, ForeignKey("drivers.id"), nullable=False)
-    route_id = Column(Integer, ForeignKey("routes.id"))
-    order_id = Column(Integer, ForeignKey("orders.id"))
+    driver_id = Column(Integer, ForeignKey("drivers.id", ondelete="CASCADE"), nullable=False)
+    route_id = Column(Integer, ForeignKey("routes.id", ondelete="SET NULL"))
+    order_id = Column(Integer, ForeignKey("orders.id", ondelete="SET NULL"))
     update_type = Column(String, nullable=False)  # location_update, order_completed, order_failed, route_update_accepted, route_update_rejected, problem_reported
     data = Column(JSON)  # Additional data (problem description, location, etc.)
     created_at = Column(DateTime, default=datetime.utcnow)
 
 
+# The ondelete rules above are enforced by databases that check foreign keys.
+# SQLite does not by default, and existing tables keep the constraints they
+# were created with, so the helpers below clear dependent rows explicitly:
+# one bulk statement per child table, inside the caller's transaction.
+
+def delete_routes(db: Session, *criteria) -> int:
+    """Delete the routes matching `criteria` together with their stops, waypoints and update links"""
+    route_ids = select(Route.id).where(*criteria)
+    db.query(RouteOrder).filter(RouteOrder.route_id.in_(route_ids)).delete(synchronize_session=False)
+    db.query(RouteWaypoint).filter(RouteWaypoint.route_id.in_(route_ids)).delete(synchronize_session=False)
+    db.query(DriverUpdate).filter(DriverUpdate.route_id.in_(route_ids)).update(
+        {DriverUpdate.route_id: None}, synchronize_session=False
+    )
+    return db.query(Route).filter(*criteria).delete(synchronize_session=False)
+
+
+def delete_driver_rows(db: Session, driver_id: int) -> int:
+    """Delete a driver with their routes and updates, and unassign their orders"""
+    delete_routes(db, Route.driver_id == driver_id)
+    db.query(DriverUpdate).filter(DriverUpdate.driver_id == driver_id).delete(synchronize_session=False)
+    db.query(Order).filter(Order.assigned_driver_id == driver_id).update(
+        {Order.assigned_driver_id: None}, synchronize_session=False
+    )
+    return db.query(Driver).filter(Driver.id == driver_id).delete(synchronize_session=False)
+
+
+def delete_order_rows(db: Session, order_id: int) -> int:
+    """Delete an order and its route stops, and unlink driver updates that mention it"""
+    db.query(RouteOrder).filter(RouteOrder.order_id == order_id).delete(synchronize_session=False)
+    db.query(DriverUpdate).filter(DriverUpdate.order_id == order_id).update(
+        {DriverUpdate.order_id: None}, synchronize_session=False
+    )
+    return db.query(Order).filter(Order.id == order_id).delete(synchronize_session=False)
+
+
+# Every route, directions and planning request starts from the first depot,
+# a rarely edited row; keep a copy for DEPOT_CACHE_TTL seconds (0 disables).
+# The depot endpoints invalidate it, other workers see edits once it expires.
+DEPOT_CACHE_TTL = float(os.getenv("DEPOT_CACHE_TTL", "60"))
+
+
+class DepotSnapshot(NamedTuple):
+    id: int
+    name: str
+    address: str
+    latitude: Optional[float]
+    longitude: Optional[float]
+
+
+_depot_cache = None  # (expires_at, Optional[DepotSnapshot])
+_depot_cache_generation = 0
+
+
+def get_default_depot(db: Session) -> Optional[DepotSnapshot]:
+    """The first depot as a detached snapshot, served from the cache while it is fresh"""
+    global _depot_cache
+    cached = _depot_cache
+    now = time.monotonic()
+    if cached is not None and cached[0] > now:
+        return cached[1]
+
+    generation = _depot_cache_generation
+    row = db.query(Depot.id, Depot.name, Depot.address, Depot.latitude, Depot.longitude)\
+        .order_by(Depot.id).first()
+    depot = DepotSnapshot(*row) if row else None
+    # Don't store a row read before a concurrent create/delete invalidated the cache
+    if generation == _depot_cache_generation:
+        _depot_cache = (now + DEPOT_CACHE_TTL, depot)
+    return depot
+
+
+def invalidate_depot_cache() -> None:
+    """Drop the cached depot after depots are created or deleted"""
+    global _depot_cache, _depot_cache_generation
+    _depot_cache_generation += 1
+    _depot_cache = None
+
+
+def _max_order_sequence(db: Session, prefix: str) -> int:
+    """Highest ORD-ddmmyy-XXXX sequence already stored for a day (seeds a new counter row)"""
+    latest = db.query(func.max(Order.order_number)).filter(
+        Order.order_number.like(f"{prefix}____")
+    ).scalar()
+    try:
+        return int(latest[len(prefix):]) if latest else 0
+    except ValueError:
+        return 0
+
+
+def generate_order_numbers(db: Session, count: int) -> List[str]:
+    """Generate `count` consecutive order numbers in format ORD-ddmmyy-XXXX"""
+    # UTC, so the day boundary doesn't move with the server's timezone or DST
+    now = datetime.now(timezone.utc)
+    date_str = f"{now.day:02d}{now.month:02d}{now.year % 100:02d}"  # ddmmyy format
+    prefix = f"ORD-{date_str}-"
+
+    # Reserve the whole block with one atomic increment of today's counter
+    last_seq = db.execute(
+        update(OrderCounter)
+        .where(OrderCounter.date_str == date_str)
+        .values(counter=OrderCounter.counter + count)
+        .returning(OrderCounter.counter)
+    ).scalar()
+
+    if last_seq is None:
+        # First order of the day: continue after any numbers stored before the counter existed
+        last_seq = _max_order_sequence(db, prefix) + count
+        db.execute(insert(OrderCounter).values(date_str=date_str, counter=last_seq))
+
+    # Format as 4-digit zero-padded numbers
+    return [f"{prefix}{seq:04d}" for seq in range(last_seq - count + 1, last_seq + 1)]
+
+
+@event.listens_for(Session, "before_flush")
+def _assign_missing_order_numbers(session, flush_context, instances):
+    """
+    Model-level default for Order.order_number: every new order flushed without
+    a number gets one, whichever code path inserted it. Numbers for a whole
+    flush are generated in one pass.
+    """
+    pending = [obj for obj in session.new if isinstance(obj, Order) and not obj.order_number]
+    if not pending:
+        return
+    with session.no_autoflush:
+        numbers = generate_order_numbers(session, len(pending))
+    for order, number in zip(pending, numbers):
+        order.order_number = number
+
+
+# Indexes earlier versions created that a composite index now covers
+OBSOLETE_INDEXES = ("ix_orders_status",)
+
+
+def _create_missing_indexes():
+    """create_all() skips indexes on tables that already exist; add any new ones"""
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(bind=engine, checkfirst=True)
+
+
+def _drop_obsolete_indexes():
+    with engine.begin() as conn:
+        for name in OBSOLETE_INDEXES:
+            conn.execute(text(f"DROP INDEX IF EXISTS {name}"))
+
+
+def _add_missing_columns():
+    """
+    create_all() never alters existing tables; add columns introduced since
+    a table was created and return them as (table, column) pairs
+    """
+    inspector = inspect(engine)
+    added = []
+    with engine.begin() as conn:
+        for table in Base.metadata.sorted_tables:
+            if not inspector.has_table(table.name):
+                continue
+            existing = {column["name"] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in existing:
+                    continue
+                ddl = f"ALTER TABLE {table.name} ADD COLUMN {column.name} {column.type.compile(dialect=engine.dialect)}"
+                default = column.server_default.arg if column.server_default is not None else None
+                backfill = None
+                if isinstance(default, TextClause):
+                    ddl += f" DEFAULT {default.text}"
+                elif isinstance(default, str):
+                    ddl += " DEFAULT '{}'".format(default.replace("'", "''"))
+                elif default is not None:
+                    # Expression defaults such as utc_timestamp() aren't allowed in
+                    # ADD COLUMN; add the column nullable and fill existing rows
+                    backfill = default
+                if not column.nullable and backfill is None:
+                    ddl += " NOT NULL"
+                conn.execute(text(ddl))
+                if backfill is not None:
+                    conn.execute(table.update().values({column.name: backfill}))
+                added.append((table.name, column.name))
+    return added
+
+
+def _backfill_priority_rank():
+    ranks = " ".join(f"WHEN '{priority}' THEN {rank}" for priority, rank in PRIORITY_RANKS.items())
+    with engine.begin() as conn:
+        conn.execute(text(
+            f"UPDATE orders SET priority_rank = CASE priority {ranks} ELSE {UNKNOWN_PRIORITY_RANK} END"
+        ))
+
+
+def _normalize_sqlite_timestamps():
+    """
+    Pad second-precision values left by the former CURRENT_TIMESTAMP default
+    to SQLAlchemy's storage format, so string comparisons against bound
+    datetimes (the order list cursor) see equal timestamps as equal
+    """
+    if engine.dialect.name != "sqlite":
+        return
+    with engine.begin() as conn:
+        for table in Base.metadata.sorted_tables:
+            for column in table.columns:
+                default = column.server_default.arg if column.server_default is not None else None
+                if isinstance(default, utc_timestamp):
+                    conn.execute(text(
+                        f"UPDATE {table.name} SET {column.name} = {column.name} || '.000000' "
+                        f"WHERE length({column.name}) = 19"
+                    ))
+
+
 def init_db():
     Base.metadata.create_all(bind=engine)
+    added_columns = _add_missing_columns()
+    if ("orders", "priority_rank") in added_columns:
+        _backfill_priority_rank()
+    _normalize_sqlite_timestamps()
+    _create_missing_indexes()
+    _drop_obsolete_indexes()
 
 
 def get_db():
@@ -1,3 +1,7 @@
+import threading
+from contextlib import asynccontextmanager
+
+import anyio.to_thread
 from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
@@ -8,13 +12,29 @@ from dotenv import load_dotenv
 # Load environment variables from .env file
 load_dotenv()
 
-from .database import init_db
+from .database import engine, init_db
 from .api import orders, drivers, locations, routes
+from .services.speech_to_text import WHISPER_PRELOAD, preload_whisper_model
 
 # Initialize database
 init_db()
 
-app = FastAPI(title="Route Planning API", version="1.0.0")
+# Sync (def) endpoints run in AnyIO's worker threads, which default to 40.
+# Every DB-bound handler holds one thread for the whole request, so size the
+# limiter for the expected concurrency instead of the library default.
+API_THREADPOOL_SIZE = int(os.getenv("API_THREADPOOL_SIZE", "100"))
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    anyio.to_thread.current_default_thread_limiter().total_tokens = API_THREADPOOL_SIZE
+    if WHISPER_PRELOAD:
+        # Daemon thread: startup doesn't wait for the model, shutdown doesn't either
+        threading.Thread(target=preload_whisper_model, name="whisper-preload", daemon=True).start()
+    yield
+
+
+app = FastAPI(title="Route Planning API", version="1.0.0", lifespan=lifespan)
 
 # CORS middleware for frontend
 app.add_middleware(
@@ -97,7 +117,17 @@ if os.path.exists(customer_static_dir):
 
 @app.get("/api/health")
 def health_check():
-    return {"status": "ok", "message": "Route Planning API is running"}
+    pool = engine.pool
+    return {
+        "status": "ok",
+        "message": "Route Planning API is running",
+        # Connection pool usage, so exhaustion is visible before requests start timing out
+        "db_pool": {
+            "size": pool.size(),
+            "checked_out": pool.checkedout(),
+            "overflow": pool.overflow(),
+        },
+    }
 
 
 if __name__ == "__main__":
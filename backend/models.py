@@ -1,4 +1,4 @@
-from pydantic import BaseModel, EmailStr
+from pydantic import BaseModel, ConfigDict, EmailStr
 from typing import Optional, List, Dict, Any
 from datetime import datetime
 
@@ -33,8 +33,7 @@ class Driver(DriverBase):
     last_check_in_at: Optional[datetime] = None
     created_at: datetime
 
-    class Config:
-        from_attributes = True
+    model_config = ConfigDict(from_attributes=True)
 
 
 # Depot Models
@@ -54,8 +53,7 @@ class Depot(DepotBase):
     longitude: Optional[float] = None
     created_at: datetime
 
-    class Config:
-        from_attributes = True
+    model_config = ConfigDict(from_attributes=True)
 
 
 # Parking Location Models
@@ -76,8 +74,7 @@ class ParkingLocation(ParkingLocationBase):
     longitude: Optional[float] = None
     created_at: datetime
 
-    class Config:
-        from_attributes = True
+    model_config = ConfigDict(from_attributes=True)
 
 
 # Order Models
@@ -142,7 +139,8 @@ class OrderUpdate(BaseModel):
     proof_captured_at: Optional[datetime] = None
 
 
-class Order(OrderBase):
+class OrderListItem(OrderBase):
+    """Order as returned by list endpoints: without the bulky raw_text/proof_metadata"""
     id: int
     order_number: Optional[str] = None
     items: Optional[List[Dict[str, Any]]] = None
@@ -151,7 +149,6 @@ class Order(OrderBase):
     priority: str
     status: str
     source: Optional[str] = None
-    raw_text: Optional[str] = None
     validation_errors: Optional[List[str]] = None
     latitude: Optional[float] = None
     longitude: Optional[float] = None
@@ -166,13 +163,16 @@ class Order(OrderBase):
     failed_at: Optional[datetime] = None
     proof_photo_path: Optional[str] = None
     proof_signature_path: Optional[str] = None
-    proof_metadata: Optional[Dict[str, Any]] = None
     proof_captured_at: Optional[datetime] = None
-    created_at: datetime
+    created_at: Optional[datetime] = None  # nullable column, e.g. rows from older imports
     updated_at: datetime
 
-    class Config:
-        from_attributes = True
+    model_config = ConfigDict(from_attributes=True)
+
+
+class Order(OrderListItem):
+    raw_text: Optional[str] = None
+    proof_metadata: Optional[Dict[str, Any]] = None
 
 
 # Route Models
@@ -204,8 +204,7 @@ class Route(RouteBase):
     created_at: datetime
     updated_at: datetime
 
-    class Config:
-        from_attributes = True
+    model_config = ConfigDict(from_attributes=True)
 
 
 class RouteWithOrders(Route):
@@ -230,8 +229,7 @@ class DriverUpdateResponse(BaseModel):
     data: Optional[Dict[str, Any]] = None
     created_at: datetime
 
-    class Config:
-        from_attributes = True
+    model_config = ConfigDict(from_attributes=True)
 
 
 class DriverOrderAssignment(BaseModel):
@@ -241,6 +239,8 @@ class DriverOrderAssignment(BaseModel):
     route_status: Optional[str] = None
     order: Order
 
+    model_config = ConfigDict(from_attributes=True)
+
 
 class DriverStatusUpdateRequest(BaseModel):
     status: str
@@ -1,3 +1,4 @@
+import os
 from typing import List, Dict, Optional, Any
 from .route_optimizer import optimize_route, calculate_route_improvement
 from .route_calculator import calculate_distance
@@ -207,7 +208,6 @@ def generate_route_summary(route: Dict[str, Any]) -> str:
     """
     if GEMINI_AVAILABLE:
         try:
-            import os
             api_key = os.getenv('GEMINI_API_KEY')
             if api_key:
                 genai.configure(api_key=api_key)
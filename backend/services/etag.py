@@ -0,0 +1,37 @@
+"""
+ETag helpers for conditional GETs.
+
+Resources with an updated_at column are tagged from (id, updated_at) so a
+revalidation only needs that one column; the others are tagged from their
+serialized body.
+"""
+
+import hashlib
+from typing import Any, Optional
+
+from fastapi import Response
+from pydantic import BaseModel
+
+
+def compute_etag(*parts: Any) -> str:
+    """Short quoted ETag over the given values"""
+    raw = ":".join(str(part) for part in parts).encode()
+    return f'"{hashlib.blake2b(raw, digest_size=8).hexdigest()}"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Check an If-None-Match header (which may list several tags) against an ETag"""
+    if not if_none_match:
+        return False
+    candidates = [tag.strip() for tag in if_none_match.split(",")]
+    # Weak comparison, as RFC 9110 requires for If-None-Match
+    return "*" in candidates or etag in {tag[2:] if tag.startswith("W/") else tag for tag in candidates}
+
+
+def conditional_json_response(payload: BaseModel, if_none_match: Optional[str]) -> Response:
+    """Serialize once, tag the body and answer 304 when the client already has it"""
+    body = payload.model_dump_json()
+    etag = compute_etag(body)
+    if etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers={"ETag": etag})
+    return Response(content=body, media_type="application/json", headers={"ETag": etag})
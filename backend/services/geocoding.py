@@ -1,66 +1,120 @@
+import os
+import threading
+import anyio.to_thread
 import requests
-from typing import Optional, Dict
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from typing import Iterable, Optional, Dict, Tuple
 import time
 
-# Rate limiting for Nominatim (free service)
+# Rate limiting for Nominatim (free service); the public instance allows one
+# request per second, a self-hosted one can lower GEOCODE_MIN_INTERVAL
 _last_request_time = 0
-_min_request_interval = 1.0  # 1 second between requests
+_min_request_interval = float(os.getenv("GEOCODE_MIN_INTERVAL", "1.0"))
+_rate_limit_lock = threading.Lock()
 
+# Parallel lookups for batches of addresses (bounded by the rate limit above)
+GEOCODE_CONCURRENCY = int(os.getenv("GEOCODE_CONCURRENCY", "8"))
 
-def geocode_address(address: str) -> Optional[Dict[str, float]]:
+# Process-local cache of geocoding results, keyed by normalized address
+GEOCODE_CACHE_SIZE = int(os.getenv("GEOCODE_CACHE_SIZE", "4096"))
+
+
+def _wait_for_rate_limit() -> None:
+    """Reserve the next request slot and sleep until it; safe to call from several threads"""
+    global _last_request_time
+
+    with _rate_limit_lock:
+        slot = max(time.time(), _last_request_time + _min_request_interval)
+        _last_request_time = slot
+    delay = slot - time.time()
+    if delay > 0:
+        time.sleep(delay)
+
+
+def _normalize_address(address: str) -> str:
+    """Lowercase and collapse whitespace so trivially different spellings share a cache entry"""
+    return " ".join(address.lower().split())
+
+
+@lru_cache(maxsize=GEOCODE_CACHE_SIZE)
+def _geocode_normalized(address: str) -> Optional[Tuple[float, float]]:
     """
-    Geocode an address using Nominatim (OpenStreetMap)
-    Returns dict with 'lat' and 'lon' or None if not found
+    Query Nominatim for a normalized address.
+    Request errors propagate so that only definitive answers are cached.
     """
-    global _last_request_time
+    _wait_for_rate_limit()
 
-    # Rate limiting
-    current_time = time.time()
-    time_since_last = current_time - _last_request_time
-    if time_since_last < _min_request_interval:
-        time.sleep(_min_request_interval - time_since_last)
+    url = "https://nominatim.openstreetmap.org/search"
+    params = {
+        "q": address,
+        "format": "json",
+        "limit": 1
+    }
+    headers = {
+        "User-Agent": "RoutePlanningApp/1.0"
+    }
 
-    try:
-        url = "https://nominatim.openstreetmap.org/search"
-        params = {
-            "q": address,
-            "format": "json",
-            "limit": 1
-        }
-        headers = {
-            "User-Agent": "RoutePlanningApp/1.0"
-        }
+    response = requests.get(url, params=params, headers=headers, timeout=10)
+    response.raise_for_status()
 
-        response = requests.get(url, params=params, headers=headers, timeout=10)
-        response.raise_for_status()
+    data = response.json()
+    if data and len(data) > 0:
+        result = data[0]
+        return float(result["lat"]), float(result["lon"])
 
-        data = response.json()
-        if data and len(data) > 0:
-            result = data[0]
-            _last_request_time = time.time()
-            return {
-                "lat": float(result["lat"]),
-                "lon": float(result["lon"])
-            }
+    return None
 
+
+def geocode_address(address: str) -> Optional[Dict[str, float]]:
+    """
+    Geocode an address using Nominatim (OpenStreetMap)
+    Returns dict with 'lat' and 'lon' or None if not found
+    """
+    if not address or not address.strip():
         return None
 
+    try:
+        coords = _geocode_normalized(_normalize_address(address))
     except Exception as e:
         print(f"Error geocoding address '{address}': {e}")
         return None
 
+    if coords is None:
+        return None
+
+    return {
+        "lat": coords[0],
+        "lon": coords[1]
+    }
+
+
+async def geocode_address_async(address: str) -> Optional[Dict[str, float]]:
+    """
+    geocode_address for async handlers: the Nominatim request and its rate
+    limit sleep run in a worker thread instead of blocking the event loop
+    """
+    return await anyio.to_thread.run_sync(geocode_address, address)
+
+
+def geocode_addresses(addresses: Iterable[str]) -> Dict[str, Optional[Dict[str, float]]]:
+    """
+    Geocode several addresses concurrently, each distinct one once.
+    Returns a dict mapping every given address to geocode_address's result.
+    """
+    unique = list(dict.fromkeys(addresses))
+    if len(unique) <= 1:
+        return {address: geocode_address(address) for address in unique}
+
+    with ThreadPoolExecutor(max_workers=min(GEOCODE_CONCURRENCY, len(unique))) as pool:
+        return dict(zip(unique, pool.map(geocode_address, unique)))
+
 
 def reverse_geocode(lat: float, lon: float) -> Optional[str]:
     """
     Reverse geocode coordinates to address
     """
-    global _last_request_time
-
-    # Rate limiting
-    current_time = time.time()
-    time_since_last = current_time - _last_request_time
-    if time_since_last < _min_request_interval:
-        time.sleep(_min_request_interval - time_since_last)
+    _wait_for_rate_limit()
 
     try:
         url = "https://nominatim.openstreetmap.org/reverse"
@@ -78,7 +132,6 @@ def reverse_geocode(lat: float, lon: float) -> Optional[str]:
 
         data = response.json()
         if data and "display_name" in data:
-            _last_request_time = time.time()
             return data["display_name"]
 
         return None
@@ -0,0 +1,27 @@
+"""
+JSON responses for endpoints that return plain dicts.
+
+Endpoints with a response_model are already serialized by Pydantic; plain dict
+payloads (route geometries, waypoint lists) otherwise go through
+jsonable_encoder and json.dumps, which is slow for large routes. orjson is
+used when installed, the standard encoder otherwise.
+"""
+
+from typing import Any
+
+from fastapi import Response
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional dependency
+    orjson = None
+
+
+def json_response(payload: Any, status_code: int = 200) -> Response:
+    """Serialize a plain payload; types orjson doesn't know fall back to jsonable_encoder"""
+    if orjson is None:
+        return JSONResponse(jsonable_encoder(payload), status_code=status_code)
+    body = orjson.dumps(payload, default=jsonable_encoder, option=orjson.OPT_NON_STR_KEYS)
+    return Response(content=body, status_code=status_code, media_type="application/json")
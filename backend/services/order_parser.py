@@ -1,9 +1,19 @@
+import asyncio
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import anyio.to_thread
 import pytesseract
 from PIL import Image
+import io
+import json
 import re
-from typing import Dict, Optional, List, Any
+from typing import BinaryIO, Dict, Optional, List, Any, Union
 from datetime import datetime
 import os
+import time
 
 # Try to use Gemini if available, otherwise use simple regex parsing
 try:
@@ -12,9 +22,46 @@ try:
 except ImportError:
     GEMINI_AVAILABLE = False
 
+# Parse results of uploaded documents keyed by SHA-256 of their content, so a
+# resubmitted scan or fax skips OCR and parsing
+PARSED_DOCUMENT_CACHE_TTL = int(os.getenv("PARSED_DOCUMENT_CACHE_TTL", "3600"))
+PARSED_DOCUMENT_CACHE_SIZE = int(os.getenv("PARSED_DOCUMENT_CACHE_SIZE", "256"))
+
+_parsed_document_cache: Dict[str, Any] = {}
+
+# Text extraction (PDF parsing, image decoding for OCR) is CPU-bound Python
+# that holds the GIL. PARSE_PROCESSES > 0 runs it in that many worker
+# processes; they are spawned, so the server's main module must be safe to
+# import (e.g. started via the uvicorn CLI). 0 keeps it in worker threads.
+PARSE_PROCESSES = int(os.getenv("PARSE_PROCESSES", "0"))
+
+_extract_pool: Optional[ProcessPoolExecutor] = None
+_extract_pool_lock = threading.Lock()
+
+
+def _get_extract_pool() -> ProcessPoolExecutor:
+    """Create the extraction process pool on first use"""
+    global _extract_pool
+    with _extract_pool_lock:
+        if _extract_pool is None:
+            # spawn: forking a process that already runs threads can deadlock
+            _extract_pool = ProcessPoolExecutor(
+                max_workers=PARSE_PROCESSES,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return _extract_pool
 
-def extract_text_from_image(image_path: str) -> str:
-    """Extract text from image using OCR"""
+
+def _reset_extract_pool(broken: ProcessPoolExecutor) -> None:
+    global _extract_pool
+    with _extract_pool_lock:
+        if _extract_pool is broken:
+            _extract_pool = None
+    broken.shutdown(wait=False)
+
+
+def extract_text_from_image(image_path: Union[str, BinaryIO]) -> str:
+    """Extract text from image (a path or binary file object) using OCR"""
     try:
         image = Image.open(image_path)
         text = pytesseract.image_to_string(image)
@@ -23,8 +70,8 @@ def extract_text_from_image(image_path: str) -> str:
         raise Exception(f"Error extracting text from image: {e}")
 
 
-def extract_text_from_pdf(pdf_path: str) -> str:
-    """Extract text from PDF (basic implementation)"""
+def extract_text_from_pdf(pdf_path: Union[str, BinaryIO]) -> str:
+    """Extract text from PDF (a path or binary file object; basic implementation)"""
     # For a full implementation, you'd use pdfplumber or PyPDF2
     # For now, we'll return a placeholder
     try:
@@ -40,33 +87,84 @@ def extract_text_from_pdf(pdf_path: str) -> str:
             # Fallback to PyPDF2
             try:
                 import PyPDF2
-                with open(pdf_path, 'rb') as file:
-                    reader = PyPDF2.PdfReader(file)
-                    text = ""
-                    for page in reader.pages:
-                        text += page.extract_text()
-                    return text
+                # PdfReader takes a path or a binary stream alike
+                reader = PyPDF2.PdfReader(pdf_path)
+                text = ""
+                for page in reader.pages:
+                    text += page.extract_text()
+                return text
             except ImportError:
                 raise Exception("No PDF library available. Install pdfplumber or PyPDF2")
     except Exception as e:
         raise Exception(f"Error extracting text from PDF: {e}")
 
 
-async def parse_document(file_path: str) -> Dict[str, Any]:
+async def parse_document(content: bytes, filename: str, content_hash: Optional[str] = None) -> Dict[str, Any]:
     """
-    Parse a document (image or PDF) and extract order information
+    Parse an uploaded document (image or PDF) held in memory and extract order
+    information. OCR and text parsing are blocking, so they run in a worker thread.
+    When content_hash is given, results for identical documents are reused.
     """
-    file_ext = os.path.splitext(file_path)[1].lower()
+    if content_hash is None:
+        return await _parse_document_content(content, filename)
+
+    now = time.time()
+    cached = _parsed_document_cache.get(content_hash)
+    if cached and cached["expires_at"] > now:
+        return dict(cached["data"])
+
+    parsed_data = await _parse_document_content(content, filename)
+
+    _parsed_document_cache.pop(content_hash, None)
+    while len(_parsed_document_cache) >= PARSED_DOCUMENT_CACHE_SIZE:
+        # Dicts keep insertion order, so this drops the oldest entry
+        del _parsed_document_cache[next(iter(_parsed_document_cache))]
+    _parsed_document_cache[content_hash] = {
+        "expires_at": now + PARSED_DOCUMENT_CACHE_TTL,
+        "data": dict(parsed_data)
+    }
+    return parsed_data
+
+
+async def _parse_document_content(content: bytes, filename: str) -> Dict[str, Any]:
+    """Extract text in the process pool (when enabled), then parse it in a worker thread"""
+    if PARSE_PROCESSES <= 0:
+        return await anyio.to_thread.run_sync(parse_document_bytes, content, filename)
+
+    pool = _get_extract_pool()
+    try:
+        raw_text = await asyncio.get_running_loop().run_in_executor(pool, extract_text_from_bytes, content, filename)
+    except BrokenProcessPool:
+        # A worker died (e.g. killed for memory); start a fresh pool next time
+        # and extract this document in a thread instead
+        _reset_extract_pool(pool)
+        return await anyio.to_thread.run_sync(parse_document_bytes, content, filename)
+    return await anyio.to_thread.run_sync(parse_order_from_text, raw_text, raw_text)
+
+
+def _extract_text(source: Union[str, BinaryIO], filename: str) -> str:
+    """Extract text from a path or file object, dispatching on the filename's extension"""
+    file_ext = os.path.splitext(filename)[1].lower()
 
     # Extract text based on file type
     if file_ext in ['.png', '.jpg', '.jpeg', '.gif', '.bmp', '.tiff']:
-        raw_text = extract_text_from_image(file_path)
+        return extract_text_from_image(source)
     elif file_ext == '.pdf':
-        raw_text = extract_text_from_pdf(file_path)
+        return extract_text_from_pdf(source)
     else:
         raise Exception(f"Unsupported file type: {file_ext}")
 
-    # Parse the extracted text
+
+def extract_text_from_bytes(content: bytes, filename: str) -> str:
+    """Extract text from a document's bytes (blocking; picklable for the process pool)"""
+    return _extract_text(io.BytesIO(content), filename)
+
+
+def parse_document_bytes(content: bytes, filename: str) -> Dict[str, Any]:
+    """
+    Parse a document (image or PDF) from its bytes without touching disk (blocking)
+    """
+    raw_text = extract_text_from_bytes(content, filename)
     return parse_order_from_text(raw_text, raw_text=raw_text)
 
 
@@ -90,7 +188,6 @@ def parse_order_from_text(text: str, raw_text: Optional[str] = None) -> Dict[str
 
 def parse_with_gemini(text: str) -> Dict[str, Any]:
     """Parse order using Google Gemini API"""
-    import os
     api_key = os.getenv('GEMINI_API_KEY')
     if not api_key:
         raise Exception("Gemini API key not found. Set GEMINI_API_KEY environment variable.")
@@ -122,7 +219,6 @@ Text to parse:
 Return only valid JSON, no additional text."""
 
     response = model.generate_content(prompt)
-    import json
     result_text = response.text.strip()
 
     # Remove markdown code blocks if present
@@ -144,6 +240,51 @@ Return only valid JSON, no additional text."""
     return parsed
 
 
+# Patterns for the regex fallback parser, compiled once at import
+_DMY_DATE_RE = re.compile(r'\d{1,2}\.\d{1,2}\.\d{4}')
+
+_ORDER_NUMBER_RES = [
+    re.compile(r'order[:\s#]+([A-Z0-9\-]+)', re.IGNORECASE),
+    re.compile(r'order\s+number[:\s]+([A-Z0-9\-]+)', re.IGNORECASE),
+    re.compile(r'#([A-Z0-9\-]{6,})', re.IGNORECASE),
+]
+_EMAIL_RE = re.compile(r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}\b')
+_PHONE_RES = [
+    re.compile(r'phone[:\s]+([+\d\s\-\(\)]+)', re.IGNORECASE),
+    re.compile(r'tel[:\s]+([+\d\s\-\(\)]+)', re.IGNORECASE),
+    re.compile(r'(\+?\d{1,3}[\s\-]?\(?\d{3}\)?[\s\-]?\d{3}[\s\-]?\d{4})', re.IGNORECASE),
+]
+_NON_PHONE_CHARS_RE = re.compile(r'[^\d+]')
+_ADDRESS_RES = [
+    re.compile(pattern, re.IGNORECASE | re.MULTILINE)
+    for pattern in (
+        r'address[:\s]+(.+?)(?:\n|delivery|phone|email|$)',
+        r'deliver[yi]+[:\s]+(.+?)(?:\n|phone|email|$)',
+        r'deliver[yi]+\s+to[:\s]+(.+?)(?:\n|phone|email|$)',
+        r'(\d+\s+[\w\s]+(?:street|st|avenue|ave|road|rd|boulevard|blvd|drive|dr|lane|ln|way|circle|cir)[\s,]+[\w\s,]+)',
+        r'(\d+\s+[\w\s]+(?:straße|str|platz|pl|weg|allee|ring)[\s,]+[\w\s,]+)',  # German addresses
+        r'([A-Z][a-z]+\s+(?:Street|St|Avenue|Ave|Road|Rd|Boulevard|Blvd|Drive|Dr|Lane|Ln|Way|Circle|Cir|Platz|Straße)[\s,]+[\w\s,]+)',
+    )
+]
+_WHITESPACE_RE = re.compile(r'\s+')
+_NAME_RE = re.compile(r'name[:\s]+([A-Z][a-z]+(?:\s+[A-Z][a-z]+)*)', re.IGNORECASE)
+_DESCRIPTION_RES = [
+    re.compile(pattern, re.IGNORECASE | re.MULTILINE | re.DOTALL)
+    for pattern in (
+        r'description[:\s]+(.+?)(?:\n(?:items|priority|delivery|order|customer)|$)',
+        r'notes[:\s]+(.+?)(?:\n(?:items|priority|delivery|order|customer)|$)',
+        r'special\s+instructions?[:\s]+(.+?)(?:\n(?:items|priority|delivery|order|customer)|$)',
+        r'instructions?[:\s]+(.+?)(?:\n(?:items|priority|delivery|order|customer)|$)',
+    )
+]
+_ITEM_RES = [
+    re.compile(r'(\d+)\s*x?\s*([A-Za-z\s]+?)(?:\n|$)', re.IGNORECASE | re.MULTILINE),
+    re.compile(r'([A-Za-z\s]+?)\s*[:\-]?\s*(\d+)', re.IGNORECASE | re.MULTILINE),
+]
+_ADDRESS_LINE_RE = re.compile(r'^(\d+\s+[\w\s]+|[\w\s]+\s+\d+)')
+_PHONE_LINE_RE = re.compile(r'^\+?\d')
+
+
 def parse_date_string(date_str: str) -> Optional[str]:
     """
     Parse date string in various formats and return ISO format string.
@@ -158,7 +299,7 @@ def parse_date_string(date_str: str) -> Optional[str]:
 
     try:
         # Try parsing dd.mm.yyyy format
-        if re.match(r'\d{1,2}\.\d{1,2}\.\d{4}', date_str):
+        if _DMY_DATE_RE.match(date_str):
             # Extract date part (before comma if present)
             date_part = date_str.split(',')[0].strip()
             time_part = None
@@ -215,85 +356,57 @@ def parse_with_regex(text: str, raw_text: str) -> Dict[str, Any]:
     }
 
     # Extract order number
-    order_patterns = [
-        r'order[:\s#]+([A-Z0-9\-]+)',
-        r'order\s+number[:\s]+([A-Z0-9\-]+)',
-        r'#([A-Z0-9\-]{6,})',
-    ]
-    for pattern in order_patterns:
-        match = re.search(pattern, text, re.IGNORECASE)
+    for pattern in _ORDER_NUMBER_RES:
+        match = pattern.search(text)
         if match:
             result["order_number"] = match.group(1).strip()
             break
 
     # Extract email
-    email_match = re.search(r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}\b', text)
+    email_match = _EMAIL_RE.search(text)
     if email_match:
         result["customer_email"] = email_match.group(0)
 
     # Extract phone
-    phone_patterns = [
-        r'phone[:\s]+([+\d\s\-\(\)]+)',
-        r'tel[:\s]+([+\d\s\-\(\)]+)',
-        r'(\+?\d{1,3}[\s\-]?\(?\d{3}\)?[\s\-]?\d{3}[\s\-]?\d{4})',
-    ]
-    for pattern in phone_patterns:
-        match = re.search(pattern, text, re.IGNORECASE)
+    for pattern in _PHONE_RES:
+        match = pattern.search(text)
         if match:
-            phone = re.sub(r'[^\d+]', '', match.group(1))
+            phone = _NON_PHONE_CHARS_RE.sub('', match.group(1))
             if len(phone) >= 7:
                 result["customer_phone"] = match.group(1).strip()
                 break
 
     # Extract address (look for common address patterns)
-    address_patterns = [
-        r'address[:\s]+(.+?)(?:\n|delivery|phone|email|$)',
-        r'deliver[yi]+[:\s]+(.+?)(?:\n|phone|email|$)',
-        r'deliver[yi]+\s+to[:\s]+(.+?)(?:\n|phone|email|$)',
-        r'(\d+\s+[\w\s]+(?:street|st|avenue|ave|road|rd|boulevard|blvd|drive|dr|lane|ln|way|circle|cir)[\s,]+[\w\s,]+)',
-        r'(\d+\s+[\w\s]+(?:straße|str|platz|pl|weg|allee|ring)[\s,]+[\w\s,]+)',  # German addresses
-        r'([A-Z][a-z]+\s+(?:Street|St|Avenue|Ave|Road|Rd|Boulevard|Blvd|Drive|Dr|Lane|Ln|Way|Circle|Cir|Platz|Straße)[\s,]+[\w\s,]+)',
-    ]
-    for pattern in address_patterns:
-        match = re.search(pattern, text, re.IGNORECASE | re.MULTILINE)
+    for pattern in _ADDRESS_RES:
+        match = pattern.search(text)
         if match:
             address = match.group(1).strip()
             # Clean up address
-            address = re.sub(r'\s+', ' ', address)
+            address = _WHITESPACE_RE.sub(' ', address)
             if len(address) > 10:  # Reasonable address length
                 result["delivery_address"] = address
                 break
 
     # Extract customer name (look for "name:" pattern or first line)
-    name_match = re.search(r'name[:\s]+([A-Z][a-z]+(?:\s+[A-Z][a-z]+)*)', text, re.IGNORECASE)
+    name_match = _NAME_RE.search(text)
     if name_match:
         result["customer_name"] = name_match.group(1).strip()
 
     # Extract description/notes
-    description_patterns = [
-        r'description[:\s]+(.+?)(?:\n(?:items|priority|delivery|order|customer)|$)',
-        r'notes[:\s]+(.+?)(?:\n(?:items|priority|delivery|order|customer)|$)',
-        r'special\s+instructions?[:\s]+(.+?)(?:\n(?:items|priority|delivery|order|customer)|$)',
-        r'instructions?[:\s]+(.+?)(?:\n(?:items|priority|delivery|order|customer)|$)',
-    ]
-    for pattern in description_patterns:
-        match = re.search(pattern, text, re.IGNORECASE | re.MULTILINE | re.DOTALL)
+    for pattern in _DESCRIPTION_RES:
+        match = pattern.search(text)
         if match:
             desc = match.group(1).strip()
             # Clean up description (remove extra whitespace)
-            desc = re.sub(r'\s+', ' ', desc)
+            desc = _WHITESPACE_RE.sub(' ', desc)
             if len(desc) > 5:  # Only if meaningful length
                 result["description"] = desc
                 break
 
     # Extract items (simple pattern matching)
     items = []
-    item_patterns = [
-        r'(\d+)\s*x?\s*([A-Za-z\s]+?)(?:\n|$)',
-        r'([A-Za-z\s]+?)\s*[:\-]?\s*(\d+)',
-    ]
-    for pattern in item_patterns:
-        matches = re.finditer(pattern, text, re.IGNORECASE | re.MULTILINE)
+    for pattern in _ITEM_RES:
+        matches = pattern.finditer(text)
         for match in matches:
             try:
                 quantity = int(match.group(1)) if match.group(1).isdigit() else int(match.group(2))
@@ -334,7 +447,7 @@ def parse_with_regex(text: str, raw_text: str) -> Dict[str, Any]:
             for line in lines:
                 line = line.strip()
                 # Pattern: number + text (e.g., "123 Main Street" or "Hauptstraße 123")
-                if re.match(r'^(\d+\s+[\w\s]+|[\w\s]+\s+\d+)', line) and len(line) > 10:
+                if _ADDRESS_LINE_RE.match(line) and len(line) > 10:
                     result["delivery_address"] = line
                     break
 
@@ -343,7 +456,7 @@ def parse_with_regex(text: str, raw_text: str) -> Dict[str, Any]:
             for line in lines:
                 line = line.strip()
                 # Skip lines that are clearly not addresses (emails, phones, etc.)
-                if '@' in line or re.match(r'^\+?\d', line):
+                if '@' in line or _PHONE_LINE_RE.match(line):
                     continue
                 if len(line) > 10 and not line.lower().startswith(('order', 'customer', 'phone', 'email', 'item')):
                     result["delivery_address"] = line
@@ -12,7 +12,9 @@ Setup:
 5. Run server: docker run -t -i -p 5000:5000 -v $(pwd):/data osrm/osrm-backend osrm-routed --algorithm mld /data/baden-wuerttemberg-latest.osrm
 """
 
+from functools import lru_cache
 from typing import List, Dict, Tuple, Optional, Any
+import math
 import os
 import requests
 from datetime import timedelta
@@ -31,12 +33,22 @@ logger = logging.getLogger(__name__)
 OSRM_BASE_URL = os.getenv("OSRM_BASE_URL", "http://localhost:5001")
 OSRM_ENABLED = os.getenv("OSRM_ENABLED", "true").lower() == "true"
 
+# Routes are deterministic for a given OSRM dataset, so successful responses are
+# memoized per process. Coordinates are rounded to ~1 m to make the key stable.
+OSRM_ROUTE_CACHE_SIZE = int(os.getenv("OSRM_ROUTE_CACHE_SIZE", "4096"))
+COORDINATE_PRECISION = 5
+
 
 class OSRMError(Exception):
     """Custom exception for OSRM-related errors"""
     pass
 
 
+class OSRMUnavailableError(OSRMError):
+    """The OSRM server did not answer the availability check"""
+    pass
+
+
 def check_osrm_available() -> bool:
     """Check if OSRM server is available"""
     if not OSRM_ENABLED:
@@ -78,42 +90,47 @@ def get_route(
         Route data dict with distance (meters), duration (seconds), and geometry
         Returns None if OSRM is unavailable or route not found
     """
-    if not OSRM_ENABLED or not check_osrm_available():
-        return None
-
-    try:
-        # OSRM format: lon,lat (note: longitude first!)
-        coordinates = f"{start_lon},{start_lat};{end_lon},{end_lat}"
-        url = f"{OSRM_BASE_URL}/route/v1/{profile}/{coordinates}"
-
-        params = {
-            "overview": overview,
-            "geometries": geometries,
-            "steps": "true" if steps else "false"
-        }
-
-        response = requests.get(url, params=params, timeout=5)
-
-        if response.status_code != 200:
-            logger.warning(f"OSRM route request failed: {response.status_code}")
-            return None
+    return get_route_multi(
+        [(start_lat, start_lon), (end_lat, end_lon)],
+        profile=profile,
+        overview=overview,
+        geometries=geometries,
+        steps=steps
+    )
 
-        data = response.json()
 
-        if data.get("code") != "Ok" or not data.get("routes"):
-            logger.warning(f"OSRM route not found: {data.get('code')}")
-            return None
+def get_route_multi(
+    coords: List[Tuple[float, float]],
+    profile: str = "driving",
+    overview: str = "full",
+    geometries: str = "geojson",
+    steps: bool = False
+) -> Optional[Dict[str, Any]]:
+    """
+    Get a route through several points with a single OSRM request
 
-        route = data["routes"][0]
+    Args:
+        coords: List of (lat, lon) tuples, visited in order (at least two)
+        profile: Routing profile (driving, walking, cycling)
+        overview: Route overview level (simplified, full, false)
+        geometries: Geometry format (polyline, polyline6, geojson)
+        steps: Include turn-by-turn instructions
 
-        return {
-            "distance": route["distance"],  # meters
-            "duration": route["duration"],  # seconds
-            "geometry": route.get("geometry"),  # GeoJSON or polyline
-            "legs": route.get("legs", []),
-            "steps": route.get("steps", []) if steps else []
-        }
+    Returns:
+        Route data dict like get_route; "legs" holds one leg per consecutive pair of points
+        Returns None if OSRM is unavailable or route not found
+    """
+    if len(coords) < 2 or not OSRM_ENABLED:
+        return None
 
+    key = tuple((round(lat, COORDINATE_PRECISION), round(lon, COORDINATE_PRECISION)) for lat, lon in coords)
+    try:
+        route = _fetch_route(OSRM_BASE_URL, key, profile, overview, geometries, steps)
+    except OSRMUnavailableError:
+        return None
+    except OSRMError as e:
+        logger.warning(str(e))
+        return None
     except requests.exceptions.RequestException as e:
         logger.warning(f"OSRM request error: {e}")
         return None
@@ -121,6 +138,56 @@ def get_route(
         logger.error(f"OSRM error: {e}")
         return None
 
+    # Shallow copy so callers can't alter the cached entry's top-level fields
+    return dict(route)
+
+
+@lru_cache(maxsize=OSRM_ROUTE_CACHE_SIZE)
+def _fetch_route(
+    base_url: str,
+    coords: Tuple[Tuple[float, float], ...],
+    profile: str,
+    overview: str,
+    geometries: str,
+    steps: bool
+) -> Dict[str, Any]:
+    """
+    Query OSRM's /route service (base_url is part of the cache key).
+    Failures raise so that only successful routes are cached.
+    """
+    if not check_osrm_available():
+        raise OSRMUnavailableError()
+
+    # OSRM format: lon,lat (note: longitude first!)
+    coordinates = ";".join(f"{lon},{lat}" for lat, lon in coords)
+    url = f"{base_url}/route/v1/{profile}/{coordinates}"
+
+    params = {
+        "overview": overview,
+        "geometries": geometries,
+        "steps": "true" if steps else "false"
+    }
+
+    response = requests.get(url, params=params, timeout=5)
+
+    if response.status_code != 200:
+        raise OSRMError(f"OSRM route request failed: {response.status_code}")
+
+    data = response.json()
+
+    if data.get("code") != "Ok" or not data.get("routes"):
+        raise OSRMError(f"OSRM route not found: {data.get('code')}")
+
+    route = data["routes"][0]
+
+    return {
+        "distance": route["distance"],  # meters
+        "duration": route["duration"],  # seconds
+        "geometry": route.get("geometry"),  # GeoJSON or polyline
+        "legs": route.get("legs", []),
+        "steps": route.get("steps", []) if steps else []
+    }
+
 
 def get_route_distance_and_time(
     start_lat: float,
@@ -341,8 +408,6 @@ def find_street_parking_near_delivery(
     Returns:
         Dict with parking location (lat, lon) snapped to nearest road, or None
     """
-    import math
-
     if not OSRM_ENABLED or not check_osrm_available():
         return None
 
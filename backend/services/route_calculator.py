@@ -5,7 +5,12 @@ import logging
 
 # Try to import OSRM client
 try:
-    from .osrm_client import get_route_distance_and_time, get_route_geometry, check_osrm_available
+    from .osrm_client import (
+        get_route_distance_and_time,
+        get_route_geometry,
+        check_osrm_available,
+        find_street_parking_near_delivery,
+    )
     OSRM_AVAILABLE = True
 except ImportError:
     OSRM_AVAILABLE = False
@@ -160,9 +165,8 @@ def find_nearest_parking(
             logger.debug(f"OSM parking lookup failed: {exc}")
 
     # 3) Dynamic parking via OSRM
-    if use_dynamic_parking:
+    if use_dynamic_parking and OSRM_AVAILABLE:
         try:
-            from .osrm_client import find_street_parking_near_delivery
             dynamic_parking = find_street_parking_near_delivery(
                 delivery_lat,
                 delivery_lon,
@@ -1,6 +1,7 @@
 from typing import List, Dict, Tuple, Optional, Any
 import math
 import logging
+import random
 from collections import defaultdict
 
 # Try to import OSRM client
@@ -218,7 +219,6 @@ def cluster_orders_kmeans(
         return [[idx] for idx in valid_indices]
 
     # Initialize centroids randomly
-    import random
     centroids = random.sample(coords, num_clusters)
 
     clusters = [[] for _ in range(num_clusters)]
@@ -145,13 +145,13 @@ def calculate_distance_matrix(points: List[Tuple[float, float]]) -> List[List[fl
     n = len(points)
     matrix = [[0.0] * n for _ in range(n)]
 
+    # Haversine distance is symmetric, so compute each pair once
     for i in range(n):
-        for j in range(n):
-            if i != j:
-                matrix[i][j] = calculate_distance(
-                    points[i][0], points[i][1],
-                    points[j][0], points[j][1]
-                )
+        for j in range(i + 1, n):
+            matrix[i][j] = matrix[j][i] = calculate_distance(
+                points[i][0], points[i][1],
+                points[j][0], points[j][1]
+            )
     return matrix
 
 
@@ -161,6 +161,24 @@ def two_opt_swap(route: List[int], i: int, j: int) -> List[int]:
     return new_route
 
 
+def _two_opt_candidate_distances(route: List[int], distance_matrix: List[List[float]]):
+    """
+    Prefix sums over the route's edges, so the length of any 2-opt swap can be
+    computed in O(1) instead of walking the whole route.
+    Returns (points, forward, backward): points is the route as matrix indices
+    framed by the depot; forward[m] is the length up to points[m]; backward[m]
+    is the length of points[1..m] traversed in reverse. The matrix may be
+    asymmetric (OSRM durations/distances), hence both directions.
+    """
+    points = [0] + [order_idx + 1 for order_idx in route] + [0]
+    forward = [0.0] * len(points)
+    backward = [0.0] * len(points)
+    for m in range(1, len(points)):
+        forward[m] = forward[m - 1] + distance_matrix[points[m - 1]][points[m]]
+        backward[m] = backward[m - 1] + (distance_matrix[points[m]][points[m - 1]] if m > 1 else 0.0)
+    return points, forward, backward
+
+
 def calculate_route_distance(route: List[int], distance_matrix: List[List[float]]) -> float:
     """Calculate total distance for a route"""
     if len(route) < 2:
@@ -188,8 +206,9 @@ def optimize_route_2opt(
     2-opt route optimization algorithm
     Returns list of order indices in optimized order
     """
-    if not orders:
-        return []
+    # Zero or one stop: nothing to order, so skip the distance matrix (and its OSRM table request)
+    if len(orders) <= 1:
+        return list(range(len(orders)))
 
     # Pre-compute parking spots for each order if parking_locations provided
     order_parking = {}
@@ -206,18 +225,15 @@ def optimize_route_2opt(
     depot_lat = depot.get('lat') or depot.get('latitude')
     depot_lon = depot.get('lon') or depot.get('longitude')
     all_points = [(depot_lat, depot_lon)]  # Depot is index 0
-    point_to_order_idx = {0: None}
 
     for i, order in enumerate(orders):
         if i in order_parking:
             parking = order_parking[i]
             all_points.append((parking["latitude"], parking["longitude"]))
-            point_to_order_idx[len(all_points) - 1] = i
         else:
             order_lat = order.get('lat') or order.get('latitude')
             order_lon = order.get('lon') or order.get('longitude')
             all_points.append((order_lat, order_lon))
-            point_to_order_idx[len(all_points) - 1] = i
 
     # Get distance matrix (prefer OSRM, fallback to Haversine)
     distance_matrix = None
@@ -234,9 +250,8 @@ def optimize_route_2opt(
     if not distance_matrix:
         distance_matrix = calculate_distance_matrix(all_points)
 
-    # Start with nearest neighbor solution
-    initial_route = optimize_route_simple(depot, orders, parking_locations)
-    best_route = initial_route.copy()
+    # Start with nearest neighbor solution over the same matrix
+    best_route = _nearest_neighbor_route(distance_matrix, len(orders))
     best_distance = calculate_route_distance(best_route, distance_matrix)
 
     # 2-opt improvement
@@ -250,18 +265,37 @@ def optimize_route_2opt(
         improved = False
         iteration += 1
 
+        # Route positions are shifted by one in `points` (depot first)
+        points, forward, backward = _two_opt_candidate_distances(best_route, distance_matrix)
+        last = len(points) - 1
+
         for i in range(len(best_route) - 1):
+            a, b = points[i], points[i + 1]
             for j in range(i + 2, len(best_route)):
-                # Try 2-opt swap
+                c, d = points[j + 1], points[j + 2]
+                # Try 2-opt swap: ... a -> c ... (reversed) ... b -> d ...
+                new_distance = (
+                    forward[i]
+                    + distance_matrix[a][c]
+                    + (backward[j + 1] - backward[i + 1])
+                    + distance_matrix[b][d]
+                    + (forward[last] - forward[j + 2])
+                )
+
+                if new_distance > best_distance + 1e-9:
+                    continue
+                # Prefix sums round differently from a full walk, so near-ties
+                # are decided on the walked length, as before
                 new_route = two_opt_swap(best_route, i, j)
-                new_distance = calculate_route_distance(new_route, distance_matrix)
+                if new_distance >= best_distance - 1e-9:
+                    new_distance = calculate_route_distance(new_route, distance_matrix)
 
                 if new_distance < best_distance:
+                    logger.debug(f"2-opt improvement at iteration {iteration}: {new_distance:.2f}km (saved {(best_distance - new_distance):.2f}km)")
                     best_route = new_route
-                    best_distance = new_distance
+                    best_distance = calculate_route_distance(new_route, distance_matrix)
                     improved = True
                     improvements_made += 1
-                    logger.debug(f"2-opt improvement at iteration {iteration}: {new_distance:.2f}km (saved {(best_distance - new_distance):.2f}km)")
                     break
 
             if improved:
@@ -298,18 +332,15 @@ def optimize_route_simple(
     depot_lat = depot.get('lat') or depot.get('latitude')
     depot_lon = depot.get('lon') or depot.get('longitude')
     all_points = [(depot_lat, depot_lon)]
-    point_to_order_idx = {0: None}  # Depot has no order index
 
     for i, order in enumerate(orders):
         if i in order_parking:
             parking = order_parking[i]
             all_points.append((parking["latitude"], parking["longitude"]))
-            point_to_order_idx[len(all_points) - 1] = i
         else:
             order_lat = order.get('lat') or order.get('latitude')
             order_lon = order.get('lon') or order.get('longitude')
             all_points.append((order_lat, order_lon))
-            point_to_order_idx[len(all_points) - 1] = i
 
     # Try to get OSRM distance table
     distance_matrix = None
@@ -325,38 +356,25 @@ def optimize_route_simple(
     if not distance_matrix:
         distance_matrix = calculate_distance_matrix(all_points)
 
-    unvisited = list(range(len(orders)))
+    return _nearest_neighbor_route(distance_matrix, len(orders))
+
+
+def _nearest_neighbor_route(distance_matrix: List[List[float]], num_orders: int) -> List[int]:
+    """
+    Greedy tour from the depot (matrix index 0); order i is matrix index i + 1.
+    Returns list of order indices in visiting order
+    """
+    unvisited = list(range(num_orders))
     route = []
     current_idx = 0  # Start at depot (index 0 in all_points)
 
     while unvisited:
-        nearest_order_idx = None
-        nearest_distance = float('inf')
-        nearest_point_idx = None
-
-        for order_idx in unvisited:
-            # Find the point index for this order
-            target_point_idx = None
-            for point_idx, mapped_order_idx in point_to_order_idx.items():
-                if mapped_order_idx == order_idx:
-                    target_point_idx = point_idx
-                    break
-
-            if target_point_idx is None:
-                continue
-
-            # Get distance from current position
-            distance_km = distance_matrix[current_idx][target_point_idx]
-
-            if distance_km < nearest_distance:
-                nearest_distance = distance_km
-                nearest_order_idx = order_idx
-                nearest_point_idx = target_point_idx
-
-        if nearest_order_idx is not None:
-            route.append(nearest_order_idx)
-            unvisited.remove(nearest_order_idx)
-            current_idx = nearest_point_idx
+        row = distance_matrix[current_idx]
+        # First of the nearest, in unvisited order, like a strict < scan
+        nearest_order_idx = min(unvisited, key=lambda order_idx: row[order_idx + 1])
+        route.append(nearest_order_idx)
+        unvisited.remove(nearest_order_idx)
+        current_idx = nearest_order_idx + 1
 
     return route
 
@@ -371,8 +389,10 @@ def optimize_route(
     Optimize route order, considering parking spots if provided
     Returns list of order indices in optimal sequence
     """
-    if not orders:
-        return []
+    # A single stop has only one tour; two or more can differ (closed tour, and
+    # OSRM distances are direction-dependent), so those always go to a solver
+    if len(orders) <= 1:
+        return list(range(len(orders)))
 
     if use_ortools and ORTOOLS_AVAILABLE:
         try:
@@ -0,0 +1,45 @@
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from backend.database import Base, get_db, invalidate_depot_cache
+from backend.main import app
+
+
+@pytest.fixture(autouse=True)
+def clear_depot_cache():
+  """The depot cache is process-wide; don't serve one test database's depot to another"""
+  invalidate_depot_cache()
+  yield
+  invalidate_depot_cache()
+
+
+@pytest.fixture
+def api_session_factory():
+  """Session factory over a fresh in-memory database"""
+  engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+  Base.metadata.create_all(bind=engine)
+  return sessionmaker(autoflush=False, expire_on_commit=False, bind=engine)
+
+
+@pytest.fixture
+def api_client(api_session_factory):
+  """TestClient whose get_db uses api_session_factory; restores any earlier override"""
+  def override_get_db():
+    db = api_session_factory()
+    try:
+      yield db
+    finally:
+      db.close()
+
+  previous = app.dependency_overrides.get(get_db)
+  app.dependency_overrides[get_db] = override_get_db
+  try:
+    yield TestClient(app)
+  finally:
+    if previous is None:
+      app.dependency_overrides.pop(get_db, None)
+    else:
+      app.dependency_overrides[get_db] = previous
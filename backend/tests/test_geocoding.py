@@ -0,0 +1,71 @@
+import pytest
+
+from backend.services import geocoding
+
+
+class FakeResponse:
+  def __init__(self, payload):
+    self.payload = payload
+
+  def raise_for_status(self):
+    pass
+
+  def json(self):
+    return self.payload
+
+
+@pytest.fixture(autouse=True)
+def clear_geocode_cache(monkeypatch):
+  geocoding._geocode_normalized.cache_clear()
+  monkeypatch.setattr(geocoding, "_min_request_interval", 0)
+  yield
+  geocoding._geocode_normalized.cache_clear()
+
+
+def test_repeated_addresses_hit_the_cache(monkeypatch):
+  calls = []
+
+  def fake_get(url, params=None, **kwargs):
+    calls.append(params["q"])
+    return FakeResponse([{"lat": "48.7758", "lon": "9.1829"}])
+
+  monkeypatch.setattr(geocoding.requests, "get", fake_get)
+
+  first = geocoding.geocode_address("Königstraße 1,  Stuttgart")
+  second = geocoding.geocode_address("  königstraße 1, stuttgart ")
+
+  assert first == second == {"lat": pytest.approx(48.7758), "lon": pytest.approx(9.1829)}
+  assert calls == ["königstraße 1, stuttgart"]
+
+
+def test_request_errors_are_not_cached(monkeypatch):
+  calls = []
+
+  def failing_get(url, params=None, **kwargs):
+    calls.append(params["q"])
+    raise geocoding.requests.ConnectionError("offline")
+
+  monkeypatch.setattr(geocoding.requests, "get", failing_get)
+
+  assert geocoding.geocode_address("Teststrasse 1") is None
+  assert geocoding.geocode_address("Teststrasse 1") is None
+  assert len(calls) == 2
+
+
+def test_batch_geocodes_each_distinct_address_once(monkeypatch):
+  calls = []
+
+  def fake_get(url, params=None, **kwargs):
+    calls.append(params["q"])
+    return FakeResponse([{"lat": "1.0", "lon": "2.0"}] if params["q"] != "nowhere" else [])
+
+  monkeypatch.setattr(geocoding.requests, "get", fake_get)
+
+  results = geocoding.geocode_addresses(["A street 1", "B street 2", "A street 1", "nowhere"])
+
+  assert results == {
+    "A street 1": {"lat": 1.0, "lon": 2.0},
+    "B street 2": {"lat": 1.0, "lon": 2.0},
+    "nowhere": None,
+  }
+  assert sorted(calls) == ["a street 1", "b street 2", "nowhere"]
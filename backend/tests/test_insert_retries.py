@@ -0,0 +1,66 @@
+from datetime import datetime, timezone
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from backend.api import drivers
+from backend.api.orders import insert_order
+from backend.database import Base, Driver, Order
+
+
+@pytest.fixture
+def db_session():
+  engine = create_engine("sqlite://")
+  Base.metadata.create_all(bind=engine)
+  session = sessionmaker(autoflush=False, bind=engine)()
+  try:
+    yield session
+  finally:
+    session.close()
+
+
+def _prefix():
+  return f"ORD-{datetime.now(timezone.utc).strftime('%d%m%y')}-"
+
+
+def test_insert_order_renumbers_a_taken_order_number(db_session):
+  db_session.add(Order(order_number=f"{_prefix()}0001", delivery_address="Existing"))
+  db_session.commit()
+
+  order = insert_order(db_session, Order(order_number=f"{_prefix()}0001", delivery_address="Duplicate"))
+  db_session.commit()
+
+  assert order.order_number == f"{_prefix()}0002"
+  numbers = sorted(number for (number,) in db_session.query(Order.order_number))
+  assert numbers == [f"{_prefix()}0001", f"{_prefix()}0002"]
+
+
+def test_create_driver_rejects_a_taken_access_code(api_client):
+  assert api_client.post("/api/drivers/", json={"name": "Anna", "access_code": "taken"}).status_code == 200
+
+  response = api_client.post("/api/drivers/", json={"name": "Ben", "access_code": "taken"})
+
+  assert response.status_code == 409
+
+
+def test_create_driver_retries_a_colliding_generated_token(api_client, api_session_factory, monkeypatch):
+  assert api_client.post("/api/drivers/", json={"name": "Anna", "access_code": "taken"}).status_code == 200
+  tokens = iter(["taken", "fresh"])
+  monkeypatch.setattr(drivers, "_generate_driver_token", lambda: next(tokens))
+
+  response = api_client.post("/api/drivers/", json={"name": "Ben"})
+
+  assert response.status_code == 200
+  assert response.json()["access_code"] == "fresh"
+  with api_session_factory() as db:
+    assert db.query(Driver).count() == 2
+
+
+def test_create_driver_gives_up_after_token_generation_attempts(api_client, monkeypatch):
+  assert api_client.post("/api/drivers/", json={"name": "Anna", "access_code": "taken"}).status_code == 200
+  monkeypatch.setattr(drivers, "_generate_driver_token", lambda: "taken")
+
+  response = api_client.post("/api/drivers/", json={"name": "Ben"})
+
+  assert response.status_code == 500
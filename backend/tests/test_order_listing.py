@@ -0,0 +1,85 @@
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import text
+from sqlalchemy.dialects import postgresql
+
+from backend.database import Order, json_type
+
+
+@pytest.fixture
+def client(api_session_factory, api_client):
+  db = api_session_factory()
+  now = datetime.utcnow()
+  db.add_all([
+    Order(delivery_address=f"Street {i}", latitude=48.7, longitude=9.1, created_at=now - timedelta(minutes=i))
+    for i in range(5)
+  ])
+  db.commit()
+  db.close()
+  return api_client
+
+
+def test_cursor_pages_cover_every_order_once(client):
+  first = client.get("/api/orders/", params={"limit": 2})
+  cursor = first.headers["X-Next-Cursor"]
+  second = client.get("/api/orders/", params={"limit": 3, "cursor": cursor})
+
+  ids = [o["id"] for o in first.json() + second.json()]
+  assert sorted(ids) == [1, 2, 3, 4, 5]
+
+
+@pytest.mark.parametrize("extra", [{"skip": 2}, {"after_id": 0}])
+def test_cursor_rejects_skip_and_after_id(client, extra):
+  cursor = client.get("/api/orders/", params={"limit": 2}).headers["X-Next-Cursor"]
+
+  response = client.get("/api/orders/", params={"limit": 2, "cursor": cursor, **extra})
+
+  assert response.status_code == 400
+
+
+def _page_through(client, limit):
+  ids, params = [], {"limit": limit}
+  for _ in range(10):
+    response = client.get("/api/orders/", params=params)
+    ids += [o["id"] for o in response.json()]
+    if "X-Next-Cursor" not in response.headers:
+      return ids
+    params = {"limit": limit, "cursor": response.headers["X-Next-Cursor"]}
+  raise AssertionError(f"cursor paging did not finish: {ids}")
+
+
+def test_cursor_advances_over_server_default_and_null_timestamps(api_session_factory, api_client):
+  db = api_session_factory()
+  # Outside the ORM: created_at comes from the column's server default, all in the same second
+  db.execute(text(
+    "INSERT INTO orders (delivery_address, status, priority, priority_rank) VALUES "
+    "('Raw 1', 'pending', 'normal', 3), ('Raw 2', 'pending', 'normal', 3), "
+    "('Raw 3', 'pending', 'normal', 3), ('Raw 4', 'pending', 'normal', 3)"
+  ))
+  db.execute(text("UPDATE orders SET created_at = NULL WHERE delivery_address = 'Raw 4'"))
+  db.commit()
+  db.close()
+
+  assert sorted(_page_through(api_client, limit=2)) == [1, 2, 3, 4]
+
+
+def test_unfinished_only_counts_non_empty_error_lists(api_session_factory, api_client):
+  db = api_session_factory()
+  db.add_all([
+    Order(delivery_address="No errors", validation_errors=None),
+    Order(delivery_address="Empty list", validation_errors=[]),
+    Order(delivery_address="Has errors", validation_errors=["Missing customer phone"]),
+  ])
+  db.commit()
+  db.close()
+
+  response = api_client.get("/api/orders/", params={"unfinished": True})
+
+  assert [o["delivery_address"] for o in response.json()] == ["Has errors"]
+
+
+def test_unfinished_filter_guards_json_array_length_on_postgresql():
+  condition = json_type(Order.validation_errors) == "array"
+
+  assert "json_typeof(orders.validation_errors)" in str(condition.compile(dialect=postgresql.dialect()))
@@ -0,0 +1,44 @@
+from datetime import datetime, timezone
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from backend.database import Base, Order, OrderCounter
+
+
+@pytest.fixture
+def db_session():
+  engine = create_engine("sqlite://")
+  Base.metadata.create_all(bind=engine)
+  session = sessionmaker(autoflush=False, bind=engine)()
+  try:
+    yield session
+  finally:
+    session.close()
+
+
+def _prefix():
+  return f"ORD-{datetime.now(timezone.utc).strftime('%d%m%y')}-"
+
+
+def test_new_orders_get_consecutive_numbers(db_session):
+  db_session.add_all([Order(delivery_address="A"), Order(delivery_address="B")])
+  db_session.commit()
+  db_session.add(Order(delivery_address="C"))
+  db_session.commit()
+
+  numbers = sorted(number for (number,) in db_session.query(Order.order_number))
+  assert numbers == [f"{_prefix()}0001", f"{_prefix()}0002", f"{_prefix()}0003"]
+  assert db_session.get(OrderCounter, _prefix()[4:10]).counter == 3
+
+
+def test_counter_continues_after_existing_numbers(db_session):
+  db_session.add(Order(order_number=f"{_prefix()}0041", delivery_address="Legacy"))
+  db_session.commit()
+
+  order = Order(delivery_address="New")
+  db_session.add(order)
+  db_session.commit()
+
+  assert order.order_number == f"{_prefix()}0042"
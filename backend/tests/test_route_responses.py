@@ -0,0 +1,50 @@
+import pytest
+
+from backend.database import Driver, Order
+from backend.models import RouteWithOrders
+
+
+@pytest.fixture
+def seeded(api_session_factory):
+  db = api_session_factory()
+  driver = Driver(name="Route Driver", phone="+49123", access_code="ROUTECODE")
+  orders = [Order(delivery_address=f"Weg {i}", latitude=48.7 + i / 100, longitude=9.1) for i in range(2)]
+  db.add(driver)
+  db.add_all(orders)
+  db.commit()
+  ids = {"driver": driver.id, "orders": [o.id for o in orders]}
+  db.close()
+  return ids
+
+
+def test_create_route_returns_route_with_orders(api_client, seeded):
+  response = api_client.post(
+    "/api/routes/", json={"driver_id": seeded["driver"], "name": "Morning", "order_ids": seeded["orders"]}
+  )
+
+  assert response.status_code == 200
+  body = RouteWithOrders.model_validate(response.json())
+  assert (body.driver_id, body.name, body.status) == (seeded["driver"], "Morning", "planned")
+  assert [(ro["order_id"], ro["sequence"]) for ro in body.route_orders] == list(zip(seeded["orders"], [1, 2]))
+  assert [ro["order"]["status"] for ro in body.route_orders] == ["assigned", "assigned"]
+  assert body.route_orders[0]["order"]["delivery_address"] == "Weg 0"
+
+
+def test_create_order_and_add_to_route_appends_stop(api_client, seeded):
+  route_id = api_client.post(
+    "/api/routes/", json={"driver_id": seeded["driver"], "order_ids": seeded["orders"][:1]}
+  ).json()["id"]
+
+  response = api_client.post(
+    f"/api/routes/{route_id}/orders/create",
+    json={"delivery_address": "Neue Str. 5", "latitude": 48.8, "longitude": 9.2},
+  )
+
+  assert response.status_code == 200
+  body = RouteWithOrders.model_validate(response.json())
+  assert body.id == route_id
+  assert [ro["sequence"] for ro in body.route_orders] == [1, 2]
+  new_stop = body.route_orders[1]
+  assert new_stop["order"]["delivery_address"] == "Neue Str. 5"
+  assert new_stop["order"]["assigned_driver_id"] == seeded["driver"]
+  assert new_stop["order"]["status"] == "assigned"
@@ -0,0 +1,21 @@
+from sqlalchemy import create_engine, text
+
+from backend import database
+
+
+def test_missing_func_now_column_is_added_and_backfilled(monkeypatch, tmp_path):
+  engine = create_engine(f"sqlite:///{tmp_path / 'legacy.db'}")
+  with engine.begin() as conn:
+    # routes as created before updated_at existed
+    conn.execute(text(
+      "CREATE TABLE routes (id INTEGER PRIMARY KEY, driver_id INTEGER, name VARCHAR, "
+      "date DATETIME, status VARCHAR, created_at DATETIME)"
+    ))
+    conn.execute(text("INSERT INTO routes (driver_id, status) VALUES (1, 'planned')"))
+  monkeypatch.setattr(database, "engine", engine)
+
+  added = database._add_missing_columns()
+
+  assert ("routes", "updated_at") in added
+  with engine.connect() as conn:
+    assert conn.execute(text("SELECT updated_at FROM routes")).scalar() is not None